@@ -0,0 +1,137 @@
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Mapping, Optional
+
+from app.core.metrics import metrics
+
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+# Pause after a throttle that carries no retry hint.
+DEFAULT_THROTTLE_PAUSE = 1.0
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset headers such as "1s", "6m0s" or "250ms" into seconds."""
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * DURATION_SECONDS[unit] for amount, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for calls to a rate-limited API.
+
+    The limit grows by ``increase`` per window of successful calls and is
+    multiplied by ``decrease`` on every throttle. Rate-limit headers cap the
+    limit at the remaining request quota and pause new calls until the quota
+    resets when it is exhausted or a retry-after is given.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._waiting = 0
+        self._blocked_until = 0.0
+        self._cond = asyncio.Condition()
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}.limit", self.limit)
+        metrics.set_gauge(f"{self.name}.in_flight", self._in_flight)
+        metrics.set_gauge(f"{self.name}.waiting", self._waiting)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[float]:
+        """Hold one concurrency slot; yields the seconds spent queueing for it."""
+        started = time.perf_counter()
+        async with self._cond:
+            self._waiting += 1
+            self._publish()
+            try:
+                while True:
+                    pause = self._blocked_until - time.monotonic()
+                    if pause <= 0 and self._in_flight < self.limit:
+                        break
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=pause if pause > 0 else None)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+            self._publish()
+
+        waited = time.perf_counter() - started
+        metrics.increment(f"{self.name}.acquired")
+        metrics.increment(f"{self.name}.queue_wait_seconds", waited)
+        try:
+            yield waited
+        finally:
+            async with self._cond:
+                self._in_flight -= 1
+                self._publish()
+                self._cond.notify_all()
+
+    def on_success(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        self._limit = min(self.max_limit, self._limit + self.increase / max(self._limit, 1.0))
+        if headers is not None:
+            remaining = _header_int(headers, "x-ratelimit-remaining-requests")
+            if remaining is not None:
+                self._limit = max(float(self.min_limit), min(self._limit, float(remaining)))
+                if remaining == 0:
+                    self._pause(parse_reset_duration(headers.get("x-ratelimit-reset-requests")))
+        self._publish()
+
+    def on_throttle(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        self._limit = max(float(self.min_limit), self._limit * self.decrease)
+        metrics.increment(f"{self.name}.throttled")
+        pause = None
+        if headers is not None:
+            retry_after_ms = _header_int(headers, "retry-after-ms")
+            if retry_after_ms is not None:
+                pause = retry_after_ms / 1000
+            else:
+                pause = parse_reset_duration(headers.get("retry-after")) or parse_reset_duration(
+                    headers.get("x-ratelimit-reset-requests")
+                )
+        self._pause(pause or DEFAULT_THROTTLE_PAUSE)
+        self._publish()
+
+    def _pause(self, seconds: Optional[float]) -> None:
+        if seconds:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
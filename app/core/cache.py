@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.metrics import metrics
+
+
+def content_hash(*parts: Any) -> str:
+    """Return a stable SHA-256 hex digest for the given key parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryLRU:
+    """Bounded in-memory LRU map."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, value: Any) -> int:
+        """Store a value and return how many entries were evicted."""
+        if self.max_entries <= 0:
+            return 0
+        evicted = 0
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+        return evicted
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskStore:
+    """JSON-file store with size-based eviction of the least recently used entries."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._total_bytes = sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        return [
+            entry for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.endswith(".json")
+        ]
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # Touch the file so eviction treats it as recently used.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any) -> int:
+        """Store a value and return how many entries were evicted."""
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return 0
+
+        path = self._path(key)
+        with self._lock:
+            previous = path.stat().st_size if path.exists() else 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data) - previous
+            return self._evict()
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                os.remove(path)
+            except FileNotFoundError:
+                return
+            self._total_bytes -= size
+
+    def _evict(self) -> int:
+        if self._total_bytes <= self.max_bytes:
+            return 0
+        evicted = 0
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        self._total_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._total_bytes -= size
+            evicted += 1
+        return evicted
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+
+class TieredCache:
+    """Memory LRU in front of a persistent disk store.
+
+    Each entry records what it cost to produce (seconds and tokens) so hits can
+    be reported as latency and spend saved. With ``ttl_seconds`` set, entries
+    older than that are dropped when they are next read.
+    """
+
+    def __init__(
+        self, name: str, directory: Path, max_entries: int, max_bytes: int, ttl_seconds: Optional[float] = None
+    ):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.memory = MemoryLRU(max_entries)
+        self.disk = DiskStore(directory, max_bytes) if max_bytes > 0 else None
+
+    def _count(self, event: str, value: float = 1) -> None:
+        metrics.increment(f"{self.name}.{event}", value)
+
+    def get(self, key: str) -> Optional[Any]:
+        tier = "memory"
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            tier = "disk"
+            entry = self.disk.get(key)
+            if entry is not None:
+                self.memory.put(key, entry)
+
+        if entry is not None and self._expired(entry):
+            self._count("expired")
+            self.delete(key)
+            entry = None
+
+        if entry is None:
+            self._count("misses")
+            return None
+
+        self._count(f"hits_{tier}")
+        self._count("saved_seconds", entry.get("seconds", 0))
+        self._count("saved_tokens", entry.get("tokens", 0))
+        return entry["value"]
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry.get("created_at", 0) > self.ttl_seconds
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def put(self, key: str, value: Any, seconds: float = 0.0, tokens: int = 0) -> None:
+        entry = {
+            "value": value,
+            "seconds": seconds,
+            "tokens": tokens,
+            "created_at": time.time(),
+        }
+        evicted = self.memory.put(key, entry)
+        if self.disk is not None:
+            try:
+                evicted += self.disk.put(key, entry)
+            except OSError:
+                self._count("disk_errors")
+        self._count("stores")
+        if evicted:
+            self._count("evictions", evicted)
+        metrics.set_gauge(f"{self.name}.memory_entries", len(self.memory))
+        if self.disk is not None:
+            metrics.set_gauge(f"{self.name}.disk_bytes", self.disk.total_bytes)
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -6,6 +7,116 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Settings(BaseSettings):
-    OPENAI_API_KEY: str
+    # Required by the "openai" and "compatible" backends, not by "stub"
+    OPENAI_API_KEY: Optional[str] = None
+    OPENAI_MODEL: str = "gpt-4"
+    # Completion provider: "openai", "compatible" (any OpenAI-style LLM_BASE_URL) or "stub" (offline)
+    LLM_BACKEND: str = "openai"
+    LLM_BASE_URL: Optional[str] = None
+    # Prompt budget per completion; gpt-4 has an 8k window shared with the output.
+    MAX_PROMPT_TOKENS: int = 4000
+    # Ask for JSON output on models that support it
+    OPENAI_JSON_MODE: bool = True
+    # Adaptive (AIMD) concurrency limit for completion calls
+    LLM_CONCURRENCY_INITIAL: int = 4
+    LLM_CONCURRENCY_MIN: int = 1
+    LLM_CONCURRENCY_MAX: int = 32
+    LLM_MAX_RETRIES: int = 3
+    # Per-key quota shared by every process on the host (0 disables); match your OpenAI tier
+    RATE_LIMIT_DB: str = ".cache/openai_rate_limit.sqlite3"
+    OPENAI_RPM: int = 500
+    OPENAI_TPM: int = 30000
+    # Per-attempt completion timeout, request to last streamed token: the plan's estimated seconds times
+    # LLM_TIMEOUT_ESTIMATE_FACTOR, at least LLM_TIMEOUT_SECONDS; a timed-out call moves to the fallback model
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_TIMEOUT_ESTIMATE_FACTOR: float = 1.5
+    # Pooled HTTP client of the LLM backend, opened and warmed up at startup
+    LLM_HTTP2: bool = True
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 120.0
+    LLM_HTTP_WARMUP_CONNECTIONS: int = 2
+    LLM_HTTP_WARMUP_TIMEOUT_SECONDS: float = 5.0
+    # Hedging: duplicate a call with no first token by the HEDGE_PERCENTILE of recent
+    # time-to-first-token (HEDGE_DEFAULT_DELAY_SECONDS until there are enough samples)
+    HEDGING_ENABLED: bool = False
+    HEDGE_PERCENTILE: float = 0.95
+    HEDGE_DEFAULT_DELAY_SECONDS: float = 10.0
+    HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    HEDGE_BUDGET_PER_MINUTE: int = 10
+    # Follow-up completions allowed for the missing tail of a truncated answer
+    MAX_CONTINUATIONS: int = 2
 
-settings = Settings()
\ No newline at end of file
+    # Size-aware model routing; OPENAI_MODEL is the primary model and ROUTER_FALLBACK_MODEL
+    # is only tried when the routed model times out or is throttled
+    ROUTER_ENABLED: bool = True
+    ROUTER_SMALL_MODEL: str = "gpt-4o-mini"
+    ROUTER_SMALL_MAX_QUESTIONS: int = 20
+    ROUTER_SMALL_MAX_PROMPT_TOKENS: int = 2000
+    ROUTER_FALLBACK_MODEL: str = "gpt-4o-mini"
+    ROUTER_LATENCY_TARGET_SECONDS: float = 30.0
+    ROUTER_MAX_FAILURE_RATE: float = 0.5
+
+    # Attach per-request extraction and LLM timings as a Server-Timing header
+    SERVER_TIMING_ENABLED: bool = True
+
+    # Uploads are spooled to disk in chunks; larger files and request bodies get a 413
+    UPLOAD_MAX_BYTES: int = 50 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    UPLOAD_SPOOL_DIR: Optional[str] = None
+
+    # Upload text extraction runs in a process pool off the event loop (0 workers: a thread, without limits).
+    # Each extraction is stopped past its wall-clock, CPU-time (0 disables) or per-worker address-space limit.
+    EXTRACTION_WORKERS: int = 2
+    EXTRACTION_MAX_QUEUE: int = 32
+    EXTRACTION_TIMEOUT_SECONDS: float = 60.0
+    EXTRACTION_CPU_LIMIT_SECONDS: float = 30.0
+    EXTRACTION_MEMORY_LIMIT_MB: int = 1024
+    # PDFs at least this large and long are split into page ranges extracted by several workers;
+    # at most PDF_PARALLEL_MAX_RANGES and always one worker fewer than the pool, so other uploads still get one
+    PDF_PARALLEL_MIN_BYTES: int = 512 * 1024
+    PDF_PARALLEL_MIN_PAGES: int = 32
+    PDF_PARALLEL_MAX_RANGES: int = 4
+    # PDF text engine: a name from pdf_engines.PDF_ENGINES, or "auto" to calibrate the installed
+    # engines at startup and use the fastest whose text passes the quality check (pypdf otherwise)
+    PDF_ENGINE: str = "auto"
+    PDF_ENGINE_MIN_QUALITY: float = 0.9
+    # Directory of representative *.pdf files to calibrate on instead of the built-in sample
+    PDF_CALIBRATION_SAMPLES_DIR: Optional[str] = None
+
+    # Extracted upload text keyed by file SHA-256 and extractor version; shared with the batch scripts
+    EXTRACTION_CACHE_DIR: str = ".cache/extractions"
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 64
+    EXTRACTION_CACHE_MAX_BYTES: int = 500 * 1024 * 1024
+    EXTRACTION_CACHE_TTL_SECONDS: float = 30 * 24 * 3600
+
+    # Formatted-quiz response cache
+    RESPONSE_CACHE_DIR: str = ".cache/quiz_responses"
+    RESPONSE_CACHE_MAX_ENTRIES: int = 256
+    RESPONSE_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
+
+    # Map-reduce formatting of long quizzes
+    CHUNKING_ENABLED: bool = True
+    CHUNK_MAX_CHARS: int = 8000
+    CHUNK_MAX_CONCURRENCY: int = 4
+
+    # Rule-based parser tried before the LLM
+    LOCAL_PARSER_ENABLED: bool = True
+    LOCAL_PARSER_MIN_CONFIDENCE: float = 0.9
+
+    # Offline stub backend; set OPENAI_RPM=0 to load-test without the shared quota
+    STUB_LATENCY_MEDIAN_SECONDS: float = 0.5
+    STUB_LATENCY_SIGMA: float = 0.5
+    STUB_TOKENS_PER_SECOND: float = 80.0
+    STUB_RATE_LIMIT_RATE: float = 0.0
+    STUB_TIMEOUT_RATE: float = 0.0
+    STUB_SERVER_ERROR_RATE: float = 0.0
+    STUB_SEED: int = 0
+
+    # OpenAI Batch API mode of the bulk processors
+    BATCH_DIR: str = ".cache/batches"
+    BATCH_POLL_SECONDS: float = 30.0
+    # A batch still running this long after submission (its completion window is 24h) is cancelled
+    BATCH_TIMEOUT_SECONDS: float = 25 * 3600
+
+settings = Settings()
@@ -0,0 +1,126 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+# An attempt receives an event it must set once its first token has arrived.
+Attempt = Callable[[asyncio.Event], Awaitable[T]]
+
+
+class Hedger:
+    """Duplicate calls that are slow to produce their first token.
+
+    Time to first token is tracked per key (model). When an attempt has not
+    produced its first token by the ``percentile`` of recent observations, a
+    second attempt is started and whichever completes first wins; the other
+    is cancelled. At most ``budget_per_minute`` hedges are fired per minute.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float,
+        default_delay: float,
+        min_delay: float,
+        budget_per_minute: int,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self.name = name
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.budget_per_minute = budget_per_minute
+        self.min_samples = min_samples
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._fired: Deque[float] = deque()
+
+    def record_first_token(self, key: str, seconds: float) -> None:
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def deadline(self, key: str) -> float:
+        """Seconds to wait for a first token before hedging."""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)
+        return max(self.min_delay, ordered[index])
+
+    def _take_budget(self) -> bool:
+        now = time.monotonic()
+        while self._fired and now - self._fired[0] > 60:
+            self._fired.popleft()
+        if len(self._fired) >= self.budget_per_minute:
+            return False
+        self._fired.append(now)
+        return True
+
+    def _start(self, key: str, attempt: Attempt) -> "tuple[asyncio.Task, asyncio.Event]":
+        first_token = asyncio.Event()
+        started = time.perf_counter()
+
+        async def run():
+            waiter = asyncio.ensure_future(first_token.wait())
+            task = asyncio.ensure_future(attempt(first_token))
+            try:
+                await asyncio.wait({waiter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if first_token.is_set():
+                    self.record_first_token(key, time.perf_counter() - started)
+                return await task
+            finally:
+                waiter.cancel()
+                task.cancel()
+
+        return asyncio.ensure_future(run()), first_token
+
+    async def run(
+        self, key: str, attempt: Attempt, discard: Optional[Callable[[T], Awaitable[None]]] = None
+    ) -> T:
+        """Run ``attempt``, hedged; ``discard`` releases the result of an attempt that lost."""
+        primary, first_token = self._start(key, attempt)
+        deadline = self.deadline(key)
+        metrics.set_gauge(f"{self.name}.{key}.deadline_seconds", deadline)
+        token_waiter = asyncio.ensure_future(first_token.wait())
+        try:
+            await asyncio.wait({primary, token_waiter}, timeout=deadline, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            primary.cancel()
+            raise
+        finally:
+            token_waiter.cancel()
+
+        if first_token.is_set() or primary.done():
+            return await primary
+        if not self._take_budget():
+            metrics.increment(f"{self.name}.budget_exhausted")
+            return await primary
+
+        metrics.increment(f"{self.name}.fired")
+        hedge, _ = self._start(key, attempt)
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if not task.exception()]
+                if succeeded:
+                    winner = succeeded[0]
+                    if winner is hedge:
+                        metrics.increment(f"{self.name}.won")
+                    # Both finished in the same tick: release the runner-up.
+                    for task in succeeded[1:]:
+                        if discard is not None:
+                            await discard(task.result())
+                    return winner.result()
+                if not pending:
+                    # Both failed; report the original call's error.
+                    return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+                metrics.increment(f"{self.name}.cancelled")
@@ -0,0 +1,117 @@
+import logging
+from typing import Any, Dict
+
+from openai import DefaultAsyncHttpxClient
+
+try:
+    # openai>=3 is built on httpx2; custom transports must come from the same package.
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    """Response body that reports back when it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._on_close()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Pooled transport that publishes pool usage and connection reuse.
+
+    A request counts as in flight until its response body is closed. New
+    connections are counted through httpcore's trace hook, so the reuse rate
+    is the share of requests that did not have to open (and TLS-handshake)
+    a connection of their own.
+    """
+
+    def __init__(self, name: str, max_connections: int, **transport_options: Any):
+        self.name = name
+        self.max_connections = max_connections
+        self._transport = httpx.AsyncHTTPTransport(**transport_options)
+        self._in_flight = 0
+        self._requests = 0
+        self._connections = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        opened = False
+
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            nonlocal opened
+            if event == "connection.connect_tcp.complete":
+                opened = True
+
+        request.extensions = {**request.extensions, "trace": trace}
+        self._in_flight += 1
+        self._publish()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._release()
+            raise
+        finally:
+            self._requests += 1
+            if opened:
+                self._connections += 1
+                metrics.increment(f"{self.name}.connections_opened")
+            metrics.increment(f"{self.name}.requests")
+        response.stream = _CountingStream(response.stream, self._release)
+        return response
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}.in_flight", self._in_flight)
+        # Above 1.0 under HTTP/2 means requests are multiplexed over the pooled connections.
+        metrics.set_gauge(f"{self.name}.pool_saturation", self._in_flight / self.max_connections)
+        if self._requests:
+            metrics.set_gauge(f"{self.name}.connection_reuse_rate", 1 - self._connections / self._requests)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def create_llm_http_client() -> httpx.AsyncClient:
+    """Shared HTTP client for the LLM API: sized pool, keep-alive and HTTP/2 where available."""
+    http2 = settings.LLM_HTTP2 and http2_available()
+    if settings.LLM_HTTP2 and not http2:
+        logger.warning("LLM_HTTP2 is enabled but the h2 package is not installed; using HTTP/1.1.")
+    limits = httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+    transport = InstrumentedTransport(
+        "llm_http",
+        settings.LLM_HTTP_MAX_CONNECTIONS,
+        http2=http2,
+        limits=limits,
+    )
+    return DefaultAsyncHttpxClient(transport=transport, limits=limits)
@@ -0,0 +1,161 @@
+import asyncio
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional
+
+
+class LLMResult:
+    """Text and accounting of one finished chat completion."""
+
+    def __init__(
+        self,
+        text: str,
+        finish_reason: str = "stop",
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        headers: Optional[Mapping[str, str]] = None,
+        cached_tokens: int = 0,
+        first_token_seconds: Optional[float] = None,
+    ):
+        self.text = text
+        self.finish_reason = finish_reason
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        # Prompt tokens served from the provider's prompt cache (a subset of prompt_tokens).
+        self.cached_tokens = cached_tokens
+        # Seconds from sending the request to the first streamed token, when it was streamed.
+        self.first_token_seconds = first_token_seconds
+        # Response headers (rate-limit state) for the adaptive limiter.
+        self.headers = headers or {}
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class LLMError(Exception):
+    """A chat completion failed; ``headers`` carries any rate-limit hints."""
+
+    def __init__(self, message: str, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(message)
+        self.headers = headers or {}
+
+
+class LLMRateLimitError(LLMError):
+    """The provider throttled the call (HTTP 429)."""
+
+
+class LLMTimeoutError(LLMError):
+    """The call did not finish within its timeout."""
+
+
+class LLMTransientError(LLMError):
+    """Connection failure or server error worth retrying."""
+
+
+@asynccontextmanager
+async def completion_deadline(deadline: Optional[float]) -> AsyncIterator[None]:
+    """Raise LLMTimeoutError if the block is still running at event-loop time ``deadline``."""
+    try:
+        async with asyncio.timeout_at(deadline):
+            yield
+    except TimeoutError:
+        raise LLMTimeoutError("The completion did not finish within its timeout.") from None
+
+
+class LLMStream(ABC):
+    """Text deltas of a streamed completion.
+
+    ``headers`` is available as soon as the stream is opened; ``result``
+    (with the full text and token usage) once it has been consumed.
+    """
+
+    def __init__(self, headers: Optional[Mapping[str, str]] = None):
+        self.headers = headers or {}
+        self.result: Optional[LLMResult] = None
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._iterate()
+
+    @abstractmethod
+    def _iterate(self) -> AsyncIterator[str]:
+        """Async generator of the text deltas; sets ``result`` once exhausted."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class PrefetchedStream(LLMStream):
+    """A stream whose first delta has already been read from ``stream``.
+
+    The remaining deltas must arrive before event-loop time ``deadline``
+    (None: no limit), otherwise iterating raises LLMTimeoutError.
+    """
+
+    def __init__(
+        self,
+        stream: LLMStream,
+        iterator: AsyncIterator[str],
+        first: str,
+        first_token_seconds: float,
+        deadline: Optional[float] = None,
+    ):
+        super().__init__(stream.headers)
+        self._stream = stream
+        self._iterator = iterator
+        self._first = first
+        self._deadline = deadline
+        self.first_token_seconds = first_token_seconds
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        yield self._first
+        while True:
+            # Bounded per delta: a timeout must not span a yield into the consumer's code.
+            async with completion_deadline(self._deadline):
+                text = await anext(self._iterator, None)
+            if text is None:
+                break
+            yield text
+        self.result = self._stream.result
+        if self.result is not None:
+            self.result.first_token_seconds = self.first_token_seconds
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class LLMBackend(ABC):
+    """Chat completion provider that AISuggestion talks to.
+
+    Implementations raise the LLMError subclasses above so that retries,
+    throttling and model fallback work the same for every provider.
+    """
+
+    name = "base"
+    # Whether run_batch is available; without it callers send batch requests as ordinary completions.
+    batch_api = False
+
+    @abstractmethod
+    async def stream(
+        self, model: str, messages: List[Dict[str, str]], timeout: float, **options
+    ) -> LLMStream:
+        """Open a streamed completion.
+
+        ``timeout`` is handed to the transport; the caller bounds the whole
+        call, first token to last, with completion_deadline.
+        """
+
+    async def run_batch(self, requests: Dict[str, Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+        """Run ``{custom_id: {"model", "messages", **options}}`` through the provider's batch API.
+
+        Returns an LLMResult or the exception it failed with per custom_id.
+        A batch still running after ``timeout`` seconds is cancelled and
+        LLMTimeoutError raised. Only called when ``batch_api`` is set.
+        """
+        raise NotImplementedError(f"The {self.name} backend has no batch API.")
+
+    async def warm_up(self, connections: int) -> None:
+        """Open ``connections`` connections ahead of the first real call."""
+
+    async def aclose(self) -> None:
+        pass
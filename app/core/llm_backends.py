@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import random
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import openai
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.core.http_client import create_llm_http_client
+from app.core.llm import (
+    LLMBackend,
+    LLMError,
+    LLMRateLimitError,
+    LLMResult,
+    LLMStream,
+    LLMTimeoutError,
+    LLMTransientError,
+)
+from app.core.openai_batch import BATCH_ENDPOINT, BatchRequestError, BatchRunner
+from app.core.tokens import count_message_tokens, count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Characters per streamed delta of the stub, roughly one token.
+STUB_CHARS_PER_DELTA = 4
+
+
+def _cached_tokens(usage: Any) -> int:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+
+
+def _translate_openai_error(exc: openai.OpenAIError) -> LLMError:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if isinstance(exc, openai.RateLimitError):
+        return LLMRateLimitError(str(exc), headers)
+    if isinstance(exc, openai.APITimeoutError):
+        return LLMTimeoutError(str(exc))
+    if isinstance(exc, (openai.APIConnectionError, openai.InternalServerError)):
+        return LLMTransientError(str(exc), headers)
+    return LLMError(str(exc), headers)
+
+
+class OpenAIStream(LLMStream):
+    def __init__(self, stream, headers):
+        super().__init__(headers)
+        self._stream = stream
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        parts = []
+        finish_reason = "stop"
+        prompt_tokens = completion_tokens = cached_tokens = 0
+        try:
+            async for chunk in self._stream:
+                if chunk.usage:
+                    prompt_tokens = chunk.usage.prompt_tokens
+                    completion_tokens = chunk.usage.completion_tokens
+                    cached_tokens = _cached_tokens(chunk.usage)
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+                if choice.delta.content:
+                    parts.append(choice.delta.content)
+                    yield choice.delta.content
+        except openai.OpenAIError as exc:
+            raise _translate_openai_error(exc) from exc
+        self.result = LLMResult(
+            "".join(parts), finish_reason, prompt_tokens, completion_tokens, self.headers, cached_tokens
+        )
+
+    async def aclose(self) -> None:
+        await self._stream.close()
+
+
+class OpenAIBackend(LLMBackend):
+    """The OpenAI API, with the Batch API for run_batch."""
+
+    name = "openai"
+    batch_api = True
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        # Retries are handled by the caller so its limiter sees every throttle.
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=create_llm_http_client(),
+        )
+        # Batch submission and polling are not latency sensitive, so the client's own retries are fine there.
+        self.batch_runner = BatchRunner(
+            self.client.with_options(max_retries=2),
+            Path(settings.BATCH_DIR),
+            poll_seconds=settings.BATCH_POLL_SECONDS,
+        )
+
+    async def stream(
+        self, model: str, messages: List[Dict[str, str]], timeout: float, **options
+    ) -> LLMStream:
+        try:
+            raw = await self.client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                timeout=timeout,
+                stream=True,
+                stream_options={"include_usage": True},
+                **options,
+            )
+        except openai.OpenAIError as exc:
+            raise _translate_openai_error(exc) from exc
+        return OpenAIStream(raw.parse(), raw.headers)
+
+    async def run_batch(self, requests: Dict[str, Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+        outputs = await self.batch_runner.run(
+            [
+                {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+                for custom_id, body in requests.items()
+            ],
+            timeout,
+        )
+        results = {}
+        for custom_id, body in outputs.items():
+            if isinstance(body, BatchRequestError):
+                results[custom_id] = body
+                continue
+            choice = body["choices"][0]
+            usage = body.get("usage") or {}
+            results[custom_id] = LLMResult(
+                (choice["message"]["content"] or "").strip(),
+                finish_reason=choice.get("finish_reason") or "stop",
+                prompt_tokens=usage.get("prompt_tokens", 0),
+                completion_tokens=usage.get("completion_tokens", 0),
+                cached_tokens=(usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0,
+            )
+        return results
+
+    async def warm_up(self, connections: int) -> None:
+        """Pay DNS, TCP and TLS setup before traffic arrives by listing models on each connection.
+
+        Under HTTP/2 the concurrent calls share one multiplexed connection.
+        """
+        results = await asyncio.gather(
+            *(self.client.models.list(timeout=settings.LLM_HTTP_WARMUP_TIMEOUT_SECONDS) for _ in range(connections)),
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logger.warning(f"LLM connection warm-up failed for {len(failures)}/{connections} connections: {failures[0]}")
+        else:
+            logger.info(f"Warmed up {connections} LLM connections to {self.client.base_url}")
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+class OpenAICompatibleBackend(OpenAIBackend):
+    """Any server speaking the OpenAI chat completions protocol (vLLM, Ollama, a proxy...).
+
+    Such servers rarely implement the Files and Batch APIs, so batch
+    requests are sent as ordinary completions instead.
+    """
+
+    name = "compatible"
+    batch_api = False
+
+
+class StubStream(LLMStream):
+    def __init__(self, backend: "StubBackend", result: LLMResult, first_token_delay: float):
+        super().__init__(result.headers)
+        self._backend = backend
+        self._final = result
+        self._first_token_delay = first_token_delay
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        await asyncio.sleep(self._first_token_delay)
+        text = self._final.text
+        seconds_per_delta = self._backend.seconds_for_tokens(1)
+        for start in range(0, len(text), STUB_CHARS_PER_DELTA):
+            if seconds_per_delta:
+                await asyncio.sleep(seconds_per_delta)
+            yield text[start:start + STUB_CHARS_PER_DELTA]
+        self.result = self._final
+
+
+class StubBackend(LLMBackend):
+    """Deterministic local stand-in for load tests and offline runs.
+
+    Replies come from ``responder(messages)``. Each call waits a log-normal
+    time to first token (median and sigma), then produces output at
+    ``tokens_per_second``. Errors are injected at the configured rates; an
+    injected timeout stalls for the full timeout first, as a real one would.
+    Latencies and failures are drawn from a seeded generator, so a run is
+    reproducible for a given request order.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        responder: Callable[[List[Dict[str, str]]], str],
+        latency_median: float = 0.5,
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 80.0,
+        rate_limit_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.responder = responder
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.server_error_rate = server_error_rate
+        self.random = random.Random(seed)
+
+    def seconds_for_tokens(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    async def _start(self, model: str, messages: List[Dict[str, str]], timeout: float):
+        """Draw the call's fate; returns the reply and the delay before its first token."""
+        roll = self.random.random()
+        first_token_delay = self.latency_median * self.random.lognormvariate(0, self.latency_sigma)
+        if roll < self.rate_limit_rate:
+            raise LLMRateLimitError("Injected rate limit.", {"retry-after-ms": "200"})
+        roll -= self.rate_limit_rate
+        if roll < self.timeout_rate:
+            await asyncio.sleep(timeout)
+            raise LLMTimeoutError("Injected timeout.")
+        roll -= self.timeout_rate
+        if roll < self.server_error_rate:
+            await asyncio.sleep(first_token_delay)
+            raise LLMTransientError("Injected server error.")
+
+        text = self.responder(messages)
+        result = LLMResult(
+            text,
+            prompt_tokens=count_message_tokens(messages, model),
+            completion_tokens=count_tokens(text, model),
+        )
+        return result, first_token_delay
+
+    async def stream(
+        self, model: str, messages: List[Dict[str, str]], timeout: float, **options
+    ) -> LLMStream:
+        result, first_token_delay = await self._start(model, messages, timeout)
+        return StubStream(self, result, first_token_delay)
+
+
+def create_backend(stub_responder: Callable[[List[Dict[str, str]]], str]) -> LLMBackend:
+    """Build the backend selected by LLM_BACKEND; the stub answers with ``stub_responder``."""
+    if settings.LLM_BACKEND in ("openai", "compatible") and not settings.OPENAI_API_KEY:
+        raise ValueError(f"LLM_BACKEND={settings.LLM_BACKEND} requires OPENAI_API_KEY.")
+    if settings.LLM_BACKEND == "openai":
+        return OpenAIBackend(settings.OPENAI_API_KEY)
+    if settings.LLM_BACKEND == "compatible":
+        if not settings.LLM_BASE_URL:
+            raise ValueError("LLM_BACKEND=compatible requires LLM_BASE_URL.")
+        return OpenAICompatibleBackend(settings.OPENAI_API_KEY, base_url=settings.LLM_BASE_URL)
+    if settings.LLM_BACKEND == "stub":
+        return StubBackend(
+            stub_responder,
+            latency_median=settings.STUB_LATENCY_MEDIAN_SECONDS,
+            latency_sigma=settings.STUB_LATENCY_SIGMA,
+            tokens_per_second=settings.STUB_TOKENS_PER_SECOND,
+            rate_limit_rate=settings.STUB_RATE_LIMIT_RATE,
+            timeout_rate=settings.STUB_TIMEOUT_RATE,
+            server_error_rate=settings.STUB_SERVER_ERROR_RATE,
+            seed=settings.STUB_SEED,
+        )
+    raise ValueError(f"Unknown LLM_BACKEND {settings.LLM_BACKEND!r}; use openai, compatible or stub.")
@@ -0,0 +1,61 @@
+from typing import Optional
+
+
+class ModelProfile:
+    """Static limits, prices and speed of a chat model used for request planning."""
+
+    def __init__(
+        self,
+        name: str,
+        context_window: int,
+        max_output_tokens: int,
+        input_price_per_1m: float,
+        output_price_per_1m: float,
+        output_tokens_per_second: float,
+        supports_json_mode: bool = True,
+        cached_input_price_per_1m: Optional[float] = None,
+    ):
+        self.name = name
+        self.context_window = context_window
+        self.max_output_tokens = max_output_tokens
+        self.input_price_per_1m = input_price_per_1m
+        self.output_price_per_1m = output_price_per_1m
+        self.output_tokens_per_second = output_tokens_per_second
+        # response_format={"type": "json_object"} is not available on the original gpt-4.
+        self.supports_json_mode = supports_json_mode
+        # Price of prompt tokens served from the provider's prompt cache; None when the model has no caching.
+        self.cached_input_price_per_1m = cached_input_price_per_1m
+
+    def cost(self, prompt_tokens: int, output_tokens: int) -> float:
+        return (
+            prompt_tokens * self.input_price_per_1m + output_tokens * self.output_price_per_1m
+        ) / 1_000_000
+
+    def cache_savings(self, cached_tokens: int) -> float:
+        """USD saved by ``cached_tokens`` prompt tokens hitting the prompt cache."""
+        if self.cached_input_price_per_1m is None:
+            return 0.0
+        return cached_tokens * (self.input_price_per_1m - self.cached_input_price_per_1m) / 1_000_000
+
+
+MODEL_PROFILES = {
+    profile.name: profile
+    for profile in [
+        ModelProfile("gpt-4", 8192, 8192, 30.0, 60.0, 20, supports_json_mode=False),
+        ModelProfile("gpt-4-turbo", 128000, 4096, 10.0, 30.0, 35),
+        ModelProfile("gpt-4o", 128000, 16384, 2.5, 10.0, 80, cached_input_price_per_1m=1.25),
+        ModelProfile("gpt-4o-mini", 128000, 16384, 0.15, 0.6, 90, cached_input_price_per_1m=0.075),
+        ModelProfile("gpt-3.5-turbo", 16385, 4096, 0.5, 1.5, 90),
+    ]
+}
+
+
+def get_model_profile(model: str) -> ModelProfile:
+    """Return the profile for ``model``, falling back to gpt-4's conservative limits."""
+    if model in MODEL_PROFILES:
+        return MODEL_PROFILES[model]
+    # Dated snapshots such as "gpt-4o-2024-08-06" share their family's profile.
+    for name in sorted(MODEL_PROFILES, key=len, reverse=True):
+        if model.startswith(name):
+            return MODEL_PROFILES[name]
+    return MODEL_PROFILES["gpt-4"]
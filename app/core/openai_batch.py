@@ -0,0 +1,110 @@
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import openai
+from openai import AsyncOpenAI
+
+from app.core.llm import LLMTimeoutError
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchRequestError(Exception):
+    """One request of a batch came back without a usable response."""
+
+
+class BatchRunner:
+    """Run chat completion requests through the OpenAI Batch API.
+
+    Requests are written to a JSONL file, uploaded and submitted as one batch,
+    which is polled until it reaches a terminal status. Results are returned
+    per ``custom_id`` as the response body dict, or a BatchRequestError. A
+    batch still running after ``timeout`` seconds is cancelled and run()
+    raises LLMTimeoutError.
+    """
+
+    def __init__(self, client: AsyncOpenAI, work_dir: Path, poll_seconds: float):
+        self.client = client
+        self.work_dir = Path(work_dir)
+        self.poll_seconds = poll_seconds
+
+    def write_input_file(self, requests: List[Dict[str, Any]]) -> Path:
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        path = self.work_dir / f"batch_input_{time.strftime('%Y%m%d_%H%M%S')}_{len(requests)}.jsonl"
+        with open(path, "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        return path
+
+    async def run(self, requests: List[Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+        path = self.write_input_file(requests)
+        with open(path, "rb") as f:
+            input_file = await self.client.files.create(file=f, purpose="batch")
+
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(requests)} requests from {path}")
+        metrics.increment("openai_batch.submitted")
+        metrics.increment("openai_batch.requests", len(requests))
+
+        deadline = time.monotonic() + timeout
+        while batch.status not in TERMINAL_STATUSES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                await self._cancel(batch.id)
+                raise LLMTimeoutError(f"Batch {batch.id} did not finish within {timeout:g}s and was cancelled.")
+            await asyncio.sleep(min(self.poll_seconds, remaining))
+            batch = await self.client.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            if counts is not None:
+                logger.info(f"Batch {batch.id}: {batch.status} ({counts.completed}/{counts.total} done, {counts.failed} failed)")
+
+        logger.info(f"Batch {batch.id} finished with status {batch.status}")
+        metrics.increment(f"openai_batch.{batch.status}")
+
+        results: Dict[str, Any] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                content = await self.client.files.content(file_id)
+                results.update(self._parse_output(content.text))
+
+        for request in requests:
+            results.setdefault(
+                request["custom_id"],
+                BatchRequestError(f"No result in batch {batch.id} (status {batch.status})."),
+            )
+        return results
+
+    async def _cancel(self, batch_id: str) -> None:
+        metrics.increment("openai_batch.timeouts")
+        try:
+            await self.client.batches.cancel(batch_id)
+        except openai.OpenAIError as exc:
+            logger.warning(f"Could not cancel batch {batch_id}: {exc}")
+        else:
+            logger.warning(f"Cancelled batch {batch_id} after its timeout")
+
+    def _parse_output(self, text: str) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                error = record.get("error") or response.get("body", {}).get("error")
+                results[record["custom_id"]] = BatchRequestError(f"Batch request failed: {error}")
+            else:
+                results[record["custom_id"]] = response["body"]
+        return results
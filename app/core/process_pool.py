@@ -0,0 +1,254 @@
+import asyncio
+import importlib
+import logging
+import math
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; memory and CPU limits are skipped there.
+    resource = None
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Extra wall-clock time the event loop allows beyond the in-worker alarm
+# before it gives up on a worker stuck in C code and restarts the pool.
+HARD_TIMEOUT_GRACE_SECONDS = 5.0
+
+
+class PoolFullError(RuntimeError):
+    """Too many tasks are already waiting for a worker."""
+
+
+class TaskTimeoutError(TimeoutError):
+    """A task ran longer than the pool's per-task timeout."""
+
+
+class CpuTimeExceededError(TaskTimeoutError):
+    """A task used more CPU time than the pool's per-task CPU limit."""
+
+
+class WorkerCrashedError(RuntimeError):
+    """The worker running a task died (killed, or out of memory in native code)."""
+
+
+def _init_worker(memory_limit_bytes: int, preload: Iterable[str]) -> None:
+    if memory_limit_bytes and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+    # Import heavy libraries up front so the first real task does not pay for it.
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def _on_alarm(signum, frame):
+    raise TaskTimeoutError("Task exceeded its time limit.")
+
+
+def _lift_cpu_limit() -> None:
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _on_cpu_limit(signum, frame):
+    # SIGXCPU repeats every second past the soft limit; lift it so the task is interrupted once.
+    _lift_cpu_limit()
+    raise CpuTimeExceededError("Task exceeded its CPU time limit.")
+
+
+def _run_limited(timeout: float, cpu_limit: float, function: Callable[..., Any], args: tuple) -> Any:
+    """Run ``function(*args)`` in a worker, interrupting it after ``timeout`` seconds of wall-clock
+    time (SIGALRM) or ``cpu_limit`` seconds of CPU time (SIGXCPU)."""
+    limit_cpu = cpu_limit > 0 and resource is not None
+    previous_alarm = signal.signal(signal.SIGALRM, _on_alarm)
+    if limit_cpu:
+        # RLIMIT_CPU counts the worker's whole lifetime, so the task's budget goes on top of what it used so far.
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        previous_xcpu = signal.signal(signal.SIGXCPU, _on_cpu_limit)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_limit)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return function(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_alarm)
+        if limit_cpu:
+            _lift_cpu_limit()
+            signal.signal(signal.SIGXCPU, previous_xcpu)
+
+
+def _worker_processes(executor: ProcessPoolExecutor) -> List[multiprocessing.Process]:
+    # ProcessPoolExecutor has no public way to kill a worker stuck in native code;
+    # its private process table is the only handle on them.
+    return list((getattr(executor, "_processes", None) or {}).values())
+
+
+def _ready() -> bool:
+    return True
+
+
+class BoundedProcessPool:
+    """Process pool for CPU-bound work called from async code.
+
+    At most ``workers`` tasks run at once and at most ``max_queue`` wait for
+    a worker; beyond that run() raises PoolFullError instead of queueing
+    without bound. Each worker has an address-space limit of
+    ``memory_limit_mb`` (allocations past it raise MemoryError) and each task
+    is interrupted after ``timeout`` seconds of wall-clock time or
+    ``cpu_limit`` seconds of CPU time. A worker that does not respond to the
+    interrupt is killed by restarting the pool. Tasks stopped by any of these
+    limits are counted as ``<name>.killed``. A task keeps its worker until
+    it ends, even when the caller awaiting it is cancelled.
+
+    With ``workers=0`` tasks run in a thread instead: off the event loop, but
+    without limits.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        max_queue: int,
+        timeout: float,
+        memory_limit_mb: int = 0,
+        cpu_limit: float = 0.0,
+        preload: Iterable[str] = (),
+    ):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.cpu_limit = cpu_limit
+        self.preload = tuple(preload)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(max(1, workers))
+        self._queued = 0
+        self._running = 0
+
+    def _start(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # Forking a process that runs an event loop and open connections is unsafe.
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit_mb * 1024 * 1024, self.preload),
+            )
+        return self._executor
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        """Kill ``executor``'s workers if it is still the current one; the next task starts a new pool.
+
+        Other tasks that were running on it fail with BrokenProcessPool and must not restart again.
+        """
+        if executor is not self._executor:
+            return
+        self._executor = None
+        metrics.increment(f"{self.name}.restarts")
+        for process in _worker_processes(executor):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"{self.name}.queued", self._queued)
+        metrics.set_gauge(f"{self.name}.running", self._running)
+
+    async def warm_up(self) -> None:
+        """Start every worker (and its preloaded imports) before the first request."""
+        if self.workers <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        executor = self._start()
+        await asyncio.gather(*(loop.run_in_executor(executor, _ready) for _ in range(self.workers)))
+        logger.info(f"Started {self.workers} {self.name} workers")
+
+    async def run(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Run the picklable top-level ``function(*args)`` in a worker and return its result."""
+        if self._queued >= self.max_queue:
+            metrics.increment(f"{self.name}.rejected")
+            raise PoolFullError(f"{self._queued} tasks are already waiting for a {self.name} worker.")
+
+        queued_at = time.perf_counter()
+        self._queued += 1
+        self._publish()
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+            self._publish()
+        started = time.perf_counter()
+        metrics.observe(f"{self.name}.queue_wait_seconds", started - queued_at)
+
+        loop = asyncio.get_running_loop()
+        executor = None
+        self._running += 1
+        self._publish()
+        try:
+            if self.workers <= 0:
+                future = asyncio.ensure_future(asyncio.to_thread(function, *args))
+            else:
+                executor = self._start()
+                future = loop.run_in_executor(executor, _run_limited, self.timeout, self.cpu_limit, function, args)
+        except BaseException:
+            self._finish(started)
+            raise
+        # A cancelled caller cannot stop a task that is already running in a worker or thread,
+        # so its slot is held until the task itself ends; the caller only awaits a shield.
+        future.add_done_callback(lambda done: self._finish(started, done))
+        try:
+            if executor is None:
+                return await asyncio.shield(future)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), self.timeout + HARD_TIMEOUT_GRACE_SECONDS)
+            except TaskTimeoutError:
+                # Interrupted inside the worker, which stays usable.
+                raise
+            except asyncio.TimeoutError:
+                self._restart(executor)
+                raise TaskTimeoutError("Task exceeded its time limit and its worker was killed.") from None
+            except BrokenProcessPool as exc:
+                # A no-op when another task's restart killed this worker.
+                self._restart(executor)
+                raise WorkerCrashedError(f"A {self.name} worker died while running the task.") from exc
+        except CpuTimeExceededError:
+            metrics.increment(f"{self.name}.cpu_limits")
+            metrics.increment(f"{self.name}.killed")
+            raise
+        except TaskTimeoutError:
+            metrics.increment(f"{self.name}.timeouts")
+            metrics.increment(f"{self.name}.killed")
+            raise
+        except MemoryError:
+            metrics.increment(f"{self.name}.memory_errors")
+            metrics.increment(f"{self.name}.killed")
+            raise
+        except WorkerCrashedError:
+            metrics.increment(f"{self.name}.crashes")
+            metrics.increment(f"{self.name}.killed")
+            raise
+
+    def _finish(self, started: float, future: Optional[asyncio.Future] = None) -> None:
+        if future is not None and not future.cancelled():
+            # Retrieved so the error of a task whose caller gave up is not logged as unhandled.
+            future.exception()
+        self._running -= 1
+        self._publish()
+        self._slots.release()
+        metrics.observe(f"{self.name}.run_seconds", time.perf_counter() - started)
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
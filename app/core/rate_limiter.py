@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Optional
+
+from app.core.metrics import metrics
+
+
+class SharedTokenBucket:
+    """Requests-per-minute and tokens-per-minute budget shared across processes.
+
+    The bucket state lives in a SQLite file, so every API worker and batch
+    script on the host that points at the same file (and API key) draws from
+    one quota. Each acquisition runs in an IMMEDIATE transaction: refill both
+    buckets for the time elapsed, then take one request and the estimated
+    tokens if both are available.
+    """
+
+    def __init__(self, path: Path, api_key: str, requests_per_minute: int, tokens_per_minute: int):
+        self.path = Path(path)
+        # Only a digest of the key is stored on disk.
+        self.key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, requests REAL NOT NULL, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests_per_minute > 0 and self.tokens_per_minute > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _update(self, requests: int, tokens: int, force: bool = False) -> float:
+        """Take ``requests`` and ``tokens`` from the buckets (negative amounts refund).
+
+        Returns 0 when the amounts were taken, otherwise the seconds until
+        enough budget will have refilled. ``force`` takes them regardless,
+        letting the bucket go into debt.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT requests, tokens, updated_at FROM buckets WHERE key = ?", (self.key,)
+            ).fetchone()
+            if row is None:
+                available_requests, available_tokens = float(self.requests_per_minute), float(self.tokens_per_minute)
+            else:
+                elapsed = max(0.0, now - row[2])
+                available_requests = min(self.requests_per_minute, row[0] + elapsed * self.requests_per_minute / 60)
+                available_tokens = min(self.tokens_per_minute, row[1] + elapsed * self.tokens_per_minute / 60)
+
+            # A single call larger than the whole minute budget waits for a full bucket, not forever.
+            tokens = min(tokens, self.tokens_per_minute)
+            wait = 0.0
+            if not force:
+                if available_requests < requests:
+                    wait = max(wait, (requests - available_requests) * 60 / self.requests_per_minute)
+                if available_tokens < tokens:
+                    wait = max(wait, (tokens - available_tokens) * 60 / self.tokens_per_minute)
+            if wait == 0.0:
+                available_requests = min(self.requests_per_minute, available_requests - requests)
+                available_tokens = min(self.tokens_per_minute, available_tokens - tokens)
+
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, requests, tokens, updated_at) VALUES (?, ?, ?, ?)",
+                (self.key, available_requests, available_tokens, now),
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait until one request and ``tokens`` tokens are available; returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(self._update, 1, tokens)
+            if wait == 0.0:
+                break
+            metrics.increment("rate_limiter.waits")
+            waited += wait
+            await asyncio.sleep(wait)
+        metrics.increment("rate_limiter.wait_seconds", waited)
+        return waited
+
+    async def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Refund (or charge) the difference between the estimated and billed token count.
+
+        ``actual_tokens`` is 0 for a failed call, which refunds the whole estimate,
+        and None when the provider reported no usage, which leaves the estimate charged.
+        """
+        if not self.enabled or actual_tokens is None or actual_tokens == estimated_tokens:
+            return
+        await asyncio.to_thread(self._update, 0, actual_tokens - estimated_tokens, True)
@@ -0,0 +1,51 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from app.core.metrics import metrics
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight task.
+
+    The first caller for a key starts the work; later callers await the same
+    task and get the same result or exception. A waiter that is cancelled only
+    detaches itself, and the shared task is cancelled once no waiters remain.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            metrics.increment(f"{self.name}.leaders")
+        else:
+            metrics.increment(f"{self.name}.coalesced")
+
+        call.waiters += 1
+        metrics.set_gauge(f"{self.name}.in_flight", len(self._calls))
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Forget the key now, not once the task is done: a caller arriving while the
+                # cancellation unwinds must start fresh work instead of joining the dying task.
+                self._forget(key, call)
+                call.task.cancel()
+                metrics.increment(f"{self.name}.abandoned")
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        metrics.set_gauge(f"{self.name}.in_flight", len(self._calls))
@@ -0,0 +1,79 @@
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+_request_timings: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Durations collected while serving one HTTP request, rendered as a Server-Timing header.
+
+    Entries recorded under the same name are combined: durations of
+    sequential work (``"sum"``) add up, concurrent work such as chunk
+    completions (``"max"``) keeps the longest.
+    """
+
+    def __init__(self):
+        self._seconds: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._descriptions: Dict[str, str] = {}
+
+    def add(self, name: str, seconds: float, aggregate: str = "sum", description: Optional[str] = None) -> None:
+        if name in self._seconds and aggregate == "max":
+            self._seconds[name] = max(self._seconds[name], seconds)
+        else:
+            self._seconds[name] = self._seconds.get(name, 0.0) + seconds
+        self._counts[name] = self._counts.get(name, 0) + 1
+        if description is not None:
+            self._descriptions[name] = description
+
+    def header(self) -> str:
+        parts: List[str] = []
+        for name, seconds in self._seconds.items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            description = self._descriptions.get(name)
+            if self._counts[name] > 1:
+                description = f"{self._counts[name]} calls" + (f", {description}" if description else "")
+            if description:
+                part += f';desc="{description}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+def record_timing(name: str, seconds: float, aggregate: str = "sum", description: Optional[str] = None) -> None:
+    """Attach a duration to the current request's Server-Timing header, if one is being collected."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add(name, seconds, aggregate, description)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware that collects request timings and sends them as a Server-Timing header.
+
+    Only work finished before the response starts is included, so streamed
+    responses carry the timings of their setup (upload extraction) only.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.SERVER_TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+
+        async def send_with_timings(message):
+            if message["type"] == "http.response.start":
+                header = timings.header()
+                if header:
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _request_timings.reset(token)
@@ -0,0 +1,54 @@
+import logging
+import math
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Every chat message is wrapped in a few framing tokens and the reply is primed with three more.
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Load the tiktoken encoding for ``model`` or None when it is unavailable.
+
+    tiktoken reads its BPE files from TIKTOKEN_CACHE_DIR (populated at image
+    build time); when they are missing and cannot be downloaded we fall back
+    to the character heuristic instead of failing the request.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as exc:
+        logger.warning(f"tiktoken encoding for {model} unavailable, estimating tokens: {exc}")
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count the tokens of ``text`` for ``model``.
+
+    Uses the model's tiktoken encoding when available, otherwise estimates
+    about four characters per token.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model or "gpt-4")
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def count_message_tokens(messages: Iterable[Dict[str, str]], model: Optional[str] = None) -> int:
+    """Count the prompt tokens a list of chat messages will be billed for."""
+    return sum(
+        TOKENS_PER_MESSAGE + count_tokens(message["content"], model) for message in messages
+    ) + TOKENS_PER_REPLY
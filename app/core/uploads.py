@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+from app.core.metrics import BYTES_BUCKETS, metrics
+
+
+class UploadTooLargeError(ValueError):
+    """An upload or request body is larger than allowed."""
+
+
+class SpooledUpload:
+    """An upload copied to a named temporary file, with its size and SHA-256.
+
+    Extractors get ``path`` rather than the bytes, so worker processes read
+    the file themselves instead of receiving a pickled copy. The file is
+    deleted when the context exits.
+    """
+
+    def __init__(self, path: str, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        with open(self.path, "rb") as file:
+            return file.read().decode(encoding)
+
+    def close(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+async def spool_upload(
+    upload: UploadFile, max_bytes: int, chunk_size: int, directory: Optional[str] = None
+) -> SpooledUpload:
+    """Copy ``upload`` to a temporary file chunk by chunk, hashing it on the way.
+
+    Raises UploadTooLargeError as soon as more than ``max_bytes`` have been
+    read; the partial file is removed.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        metrics.increment("uploads.rejected_too_large")
+        raise UploadTooLargeError(f"Uploaded file is larger than {max_bytes} bytes.")
+
+    digest = hashlib.sha256()
+    size = 0
+    file = tempfile.NamedTemporaryFile(prefix="upload-", dir=directory, delete=False)
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                metrics.increment("uploads.rejected_too_large")
+                raise UploadTooLargeError(f"Uploaded file is larger than {max_bytes} bytes.")
+            digest.update(chunk)
+            await asyncio.to_thread(file.write, chunk)
+        file.close()
+    except BaseException:
+        file.close()
+        os.unlink(file.name)
+        raise
+    metrics.observe("uploads.bytes", size, buckets=BYTES_BUCKETS)
+    return SpooledUpload(file.name, size, digest.hexdigest())
+
+
+class RequestSizeLimitMiddleware:
+    """ASGI middleware that answers 413 once a request body exceeds ``max_bytes``.
+
+    A declared Content-Length is checked before any of the body is read;
+    chunked bodies are counted as they arrive, so an oversized upload is cut
+    off instead of being parsed and spooled in full.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def _reject(self, send) -> None:
+        metrics.increment("uploads.rejected_too_large")
+        body = json.dumps({"detail": f"Request body is larger than {self.max_bytes} bytes."}, separators=(",", ":")).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_413_CONTENT_TOO_LARGE,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                await self._reject(send)
+                return
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    metrics.increment("uploads.rejected_too_large")
+                    # Raised while the app parses the body; its exception handlers render the 413.
+                    raise HTTPException(
+                        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                        detail=f"Request body is larger than {self.max_bytes} bytes.",
+                    )
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,71 @@
+import glob
+import logging
+import os
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.process_pool import BoundedProcessPool
+from .extraction_cache import create_extraction_cache
+from .pdf_engines import (
+    DEFAULT_PDF_ENGINE,
+    PDF_ENGINES,
+    available_pdf_engines,
+    calibrate_pdf_engines,
+    choose_pdf_engine,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentExtractor:
+    """What upload extraction needs per worker: the process pool, the extracted-text cache and the PDF engine."""
+
+    def __init__(self):
+        self.pool = BoundedProcessPool(
+            "extraction_pool",
+            workers=settings.EXTRACTION_WORKERS,
+            max_queue=settings.EXTRACTION_MAX_QUEUE,
+            timeout=settings.EXTRACTION_TIMEOUT_SECONDS,
+            memory_limit_mb=settings.EXTRACTION_MEMORY_LIMIT_MB,
+            cpu_limit=settings.EXTRACTION_CPU_LIMIT_SECONDS,
+            preload=[engine.module for engine in PDF_ENGINES.values()],
+        )
+        self.cache = create_extraction_cache()
+        self.pdf_engine = DEFAULT_PDF_ENGINE
+
+    async def warm_up(self) -> None:
+        await self.pool.warm_up()
+        await self.select_pdf_engine()
+
+    async def select_pdf_engine(self) -> None:
+        """Use PDF_ENGINE, or with "auto" the fastest installed engine that passes calibration."""
+        engines = available_pdf_engines()
+        if settings.PDF_ENGINE != "auto":
+            if settings.PDF_ENGINE in engines:
+                self.pdf_engine = settings.PDF_ENGINE
+            else:
+                logger.warning(f"PDF_ENGINE {settings.PDF_ENGINE!r} is not installed; using {DEFAULT_PDF_ENGINE}.")
+            return
+        if engines == [DEFAULT_PDF_ENGINE]:
+            return
+
+        samples = None
+        if settings.PDF_CALIBRATION_SAMPLES_DIR:
+            samples = sorted(glob.glob(os.path.join(settings.PDF_CALIBRATION_SAMPLES_DIR, "*.pdf"))) or None
+        try:
+            calibrations = await self.pool.run(calibrate_pdf_engines, engines, samples)
+        except Exception as exc:
+            logger.warning(f"PDF engine calibration failed, using {DEFAULT_PDF_ENGINE}: {exc}")
+            return
+        for result in calibrations:
+            if result.error is None:
+                metrics.set_gauge(f"pdf_engine.{result.name}.calibration_seconds", result.seconds)
+                metrics.set_gauge(f"pdf_engine.{result.name}.quality", result.quality)
+        self.pdf_engine = choose_pdf_engine(calibrations, settings.PDF_ENGINE_MIN_QUALITY)
+        logger.info(
+            f"Selected PDF engine {self.pdf_engine} from calibration: "
+            f"{[result.to_dict() for result in calibrations]}"
+        )
+
+    def shutdown(self) -> None:
+        self.pool.shutdown()
@@ -0,0 +1,51 @@
+import hashlib
+import time
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from app.core.cache import TieredCache, content_hash
+from app.core.config import settings
+
+# Bump whenever text_extraction changes its output so text cached by older extractors is ignored.
+EXTRACTOR_VERSION = 2
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def create_extraction_cache() -> TieredCache:
+    """Extracted document text; the API and the batch scripts share the same disk directory."""
+    return TieredCache(
+        "extraction_cache",
+        Path(settings.EXTRACTION_CACHE_DIR),
+        max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES,
+        max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+        ttl_seconds=settings.EXTRACTION_CACHE_TTL_SECONDS,
+    )
+
+
+def extraction_cache_key(kind: str, sha256: str, engine: Optional[str] = None) -> str:
+    """Text from different PDF engines is cached separately; ``engine`` is left out for other kinds."""
+    if engine is None:
+        return content_hash("extraction", EXTRACTOR_VERSION, kind, sha256)
+    return content_hash("extraction", EXTRACTOR_VERSION, kind, engine, sha256)
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_cached(
+    cache: TieredCache, kind: str, path: Union[str, Path], extractor: Callable[[str], str]
+) -> str:
+    """Return the cached text of the file at ``path``, running ``extractor`` on a miss."""
+    key = extraction_cache_key(kind, file_sha256(path))
+    text = cache.get(key)
+    if text is None:
+        started = time.perf_counter()
+        text = extractor(str(path))
+        cache.put(key, text, seconds=time.perf_counter() - started)
+    return text
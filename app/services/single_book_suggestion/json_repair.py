@@ -0,0 +1,81 @@
+import json
+import re
+from typing import Any, List
+
+from pydantic import TypeAdapter, ValidationError
+
+from .question_stream import QuestionStreamParser
+from .single_book_suggestion_schema import quiz_output, quiz_question
+
+CODE_FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+
+
+class QuizJSONError(ValueError):
+    """Raised when model output holds no usable quiz JSON even after repair."""
+
+
+# Built once at import; building adapters per call would redo schema construction every time.
+QUIZ_OUTPUT_ADAPTER = TypeAdapter(quiz_output)
+QUESTION_LIST_ADAPTER = TypeAdapter(List[quiz_question])
+
+
+def _schema_error(exc: ValidationError) -> QuizJSONError:
+    error = exc.errors()[0]
+    location = ".".join(str(part) for part in error["loc"])
+    return QuizJSONError(f"Model output does not match the question schema at {location}: {error['msg']}")
+
+
+def validate_questions(questions: List[Any]) -> List[quiz_question]:
+    """Validate question objects parsed from model output against the strict question schema."""
+    try:
+        return QUESTION_LIST_ADAPTER.validate_python(questions)
+    except ValidationError as exc:
+        raise _schema_error(exc) from exc
+
+
+class RepairedQuiz:
+    def __init__(self, questions: List[quiz_question], complete: bool, repaired: bool, partial_text: str):
+        self.questions = questions
+        # False when the questions array was cut off before its closing bracket.
+        self.complete = complete
+        self.repaired = repaired
+        # Output up to and including the last complete question, for continuation prompts.
+        self.partial_text = partial_text
+
+
+def strip_code_fences(text: str) -> str:
+    text = text.strip()
+    # The regex retries at every whitespace run, which is slow on large unfenced replies.
+    if "```" not in text:
+        return text
+    return CODE_FENCE.sub("", text)
+
+
+def repair_quiz_json(text: str) -> RepairedQuiz:
+    """Recover the questions from possibly fenced or truncated quiz JSON.
+
+    Well-formed documents are parsed and validated in one pass. Otherwise
+    every complete question object is salvaged, a trailing partial question
+    is dropped and the array is treated as closed. Questions that do not
+    match the schema raise QuizJSONError.
+    """
+    body = strip_code_fences(text)
+    start, end = body.find("{"), body.rfind("}")
+    if start != -1 and end > start:
+        try:
+            document = QUIZ_OUTPUT_ADAPTER.validate_json(body[start:end + 1])
+        except ValidationError as exc:
+            if not any(error["type"] == "json_invalid" for error in exc.errors()):
+                raise _schema_error(exc) from exc
+        else:
+            return RepairedQuiz(document.questions, True, body != text.strip(), body)
+
+    parser = QuestionStreamParser()
+    try:
+        questions = parser.feed(body)
+    except json.JSONDecodeError as exc:
+        raise QuizJSONError(f"Model output is not valid quiz JSON: {exc}") from exc
+    if not questions and not parser.done:
+        raise QuizJSONError("Model output contains no complete question.")
+
+    return RepairedQuiz(validate_questions(questions), parser.done, True, body[:parser.last_question_end])
@@ -0,0 +1,168 @@
+import re
+from typing import Any, Dict, List, Optional, Pattern
+
+ANSWER_LINE = re.compile(
+    r"^\s*(?:correct\s+)?(?:answers?|ans)\s*[:.\-]\s*(?P<answer>.+)$", re.IGNORECASE
+)
+# "*b) Paris", "b) Paris *", "b) Paris (correct)"
+CORRECT_MARKER = re.compile(r"^\*\s*|\s*\*$|\s*\((?:correct|answer)\)$", re.IGNORECASE)
+# Answer given by label: a bare "b" / "(b)", or "b)" / "b." optionally followed by the option text
+ANSWER_LABEL = re.compile(
+    r"^(?:\(?(?P<bare>[a-h])\)?|\(?(?P<label>[a-h])[.)]\s*(?P<rest>.*))$", re.IGNORECASE
+)
+
+
+class QuizDialect:
+    """Line patterns for one quiz layout."""
+
+    def __init__(self, name: str, question: Pattern, option: Pattern):
+        self.name = name
+        self.question = question
+        self.option = option
+
+
+# Question stems: "1." / "1)" or "Q1)" / "Question 1:". Options: "a)" / "A." or "(a)".
+DIALECTS = [
+    QuizDialect(
+        "numbered",
+        re.compile(r"^\s*(?P<number>\d{1,4})\s*[.)]\s+(?P<text>.+)$"),
+        re.compile(r"^\s*\*?\s*(?P<label>[a-hA-H])\s*[.)]\s+(?P<text>.+)$"),
+    ),
+    QuizDialect(
+        "q_prefixed",
+        re.compile(r"^\s*Q(?:uestion)?\s*(?P<number>\d{1,4})\s*[.):\-]\s*(?P<text>.+)$", re.IGNORECASE),
+        re.compile(r"^\s*\*?\s*(?P<label>[a-hA-H])\s*[.)]\s+(?P<text>.+)$"),
+    ),
+    QuizDialect(
+        "numbered_paren_options",
+        re.compile(r"^\s*(?P<number>\d{1,4})\s*[.)]\s+(?P<text>.+)$"),
+        re.compile(r"^\s*\*?\s*\((?P<label>[a-hA-H])\)\s*(?P<text>.+)$"),
+    ),
+]
+
+
+class LocalParseResult:
+    def __init__(self, dialect: str, questions: List[Dict[str, Any]], confidence: float):
+        self.dialect = dialect
+        self.questions = questions
+        self.confidence = confidence
+
+
+class _Question:
+    def __init__(self, number: int, content: str):
+        self.number = number
+        self.content = content
+        self.labels: List[str] = []
+        self.options: List[str] = []
+        self.marked: List[str] = []
+        self.answer: Optional[str] = None
+
+    def resolve_answers(self) -> List[str]:
+        if self.marked:
+            return list(self.marked)
+        if not self.answer:
+            return []
+
+        answers = []
+        for part in re.split(r"\s*(?:,|;|&|\band\b)\s*", self.answer.strip()):
+            part = part.strip().rstrip(".")
+            if not part:
+                continue
+            # Exact option text first, so an answer like "A cat" is not read as label "a".
+            exact = [option for option in self.options if option.lower() == part.lower()]
+            if exact:
+                answers.append(exact[0])
+                continue
+            label_match = ANSWER_LABEL.match(part)
+            label = label_match and (label_match.group("bare") or label_match.group("label")).lower()
+            if not label or label not in self.labels:
+                return []
+            option = self.options[self.labels.index(label)]
+            rest = label_match.group("rest")
+            if rest and rest.strip().lower() != option.lower():
+                return []
+            answers.append(option)
+        return answers
+
+
+def _parse_with_dialect(lines: List[str], dialect: QuizDialect) -> LocalParseResult:
+    # Titles and instructions before the first question are ignored.
+    start = next((i for i, line in enumerate(lines) if dialect.question.match(line)), None)
+    if start is None:
+        return LocalParseResult(dialect.name, [], 0.0)
+
+    body = lines[start:]
+    questions: List[_Question] = []
+    consumed = 0
+
+    for line in body:
+        current = questions[-1] if questions else None
+
+        answer_match = ANSWER_LINE.match(line)
+        if current is not None and answer_match:
+            current.answer = answer_match.group("answer")
+            consumed += 1
+            continue
+
+        option_match = dialect.option.match(line)
+        if current is not None and option_match and current.answer is None:
+            text = option_match.group("text").strip()
+            is_marked = line.lstrip().startswith("*") or bool(CORRECT_MARKER.search(text))
+            text = CORRECT_MARKER.sub("", text).strip()
+            current.labels.append(option_match.group("label").lower())
+            current.options.append(text)
+            if is_marked:
+                current.marked.append(text)
+            consumed += 1
+            continue
+
+        question_match = dialect.question.match(line)
+        if question_match:
+            questions.append(_Question(int(question_match.group("number")), question_match.group("text").strip()))
+            consumed += 1
+            continue
+
+        if current is not None and not current.options and current.answer is None:
+            # Question stem wrapped onto the next line.
+            current.content = f"{current.content} {line.strip()}"
+            consumed += 1
+
+    formatted = []
+    well_formed = 0
+    in_sequence = 0
+    for index, question in enumerate(questions):
+        answers = question.resolve_answers()
+        if len(question.options) >= 2 and answers:
+            well_formed += 1
+        if question.number == questions[0].number + index:
+            in_sequence += 1
+        formatted.append({
+            "questionNo": index + 1,
+            "content": question.content,
+            "options": question.options,
+            "correctAnswers": answers,
+        })
+
+    confidence = (
+        (well_formed / len(questions))
+        * (in_sequence / len(questions))
+        * (consumed / len(body))
+    )
+    return LocalParseResult(dialect.name, formatted, round(confidence, 4))
+
+
+def parse_quiz(text: str) -> LocalParseResult:
+    """Parse regularly laid out quiz text without an LLM.
+
+    Every dialect is tried and the one with the highest confidence wins. The
+    confidence is the share of well-formed questions (two or more options and a
+    resolvable answer), weighted by how sequential the numbering is and how many
+    lines after the first question were understood.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    best = LocalParseResult("none", [], 0.0)
+    for dialect in DIALECTS:
+        result = _parse_with_dialect(lines, dialect)
+        if result.confidence > best.confidence:
+            best = result
+    return best
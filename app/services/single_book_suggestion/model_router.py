@@ -0,0 +1,136 @@
+import threading
+from typing import Dict, List
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.model_catalog import get_model_profile
+from app.core.tokens import count_tokens
+from .request_planner import REQUEST_OVERHEAD_SECONDS, RequestPlan, count_questions, plan_llm, plan_local
+from .single_book_suggestion_schema import single_book_suggestion_request
+
+# Weight of the newest observation in the moving averages.
+STATS_ALPHA = 0.2
+# Observations needed before a model's measured behaviour overrides its catalog profile.
+MIN_SAMPLES = 3
+
+
+class ModelStats:
+    """Moving averages of one model's latency and failure rate.
+
+    Latency is tracked as the ratio of observed to profile-predicted seconds, so
+    one number corrects every size estimate for that model.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.samples = 0
+        self.latency_factor = 1.0
+        self.failure_rate = 0.0
+
+    def record_success(self, seconds: float, completion_tokens: int) -> None:
+        predicted = REQUEST_OVERHEAD_SECONDS + completion_tokens / get_model_profile(self.model).output_tokens_per_second
+        ratio = seconds / predicted
+        # The first observations replace the neutral prior instead of being averaged into it.
+        alpha = 1.0 / (self.samples + 1) if self.samples < MIN_SAMPLES else STATS_ALPHA
+        self.latency_factor += alpha * (ratio - self.latency_factor)
+        self.failure_rate *= 1 - STATS_ALPHA
+        self.samples += 1
+
+    def record_failure(self) -> None:
+        self.failure_rate += STATS_ALPHA * (1 - self.failure_rate)
+        self.samples += 1
+
+    @property
+    def healthy(self) -> bool:
+        return self.samples < MIN_SAMPLES or self.failure_rate < settings.ROUTER_MAX_FAILURE_RATE
+
+    def expected_seconds(self, plan: RequestPlan) -> float:
+        if self.samples < MIN_SAMPLES:
+            return plan.estimated_seconds
+        return plan.estimated_seconds * self.latency_factor
+
+
+class ModelRouter:
+    """Pick the chat model for each formatting request.
+
+    Small quizzes (by question count and prompt size) prefer the small model,
+    everything else uses the primary model. A candidate is skipped when the
+    quiz does not fit it or its recent failure rate is too high; the first
+    one expected to meet the latency target wins, otherwise the primary model
+    is kept. The next usable candidate, or else the fallback model, is tried
+    on timeouts and throttling; the fallback model is never routed to first.
+    """
+
+    def __init__(self, primary: str, small: str, fallback: str):
+        self.primary = primary
+        self.small = small
+        self.fallback = fallback
+        self._stats: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, model: str) -> ModelStats:
+        with self._lock:
+            if model not in self._stats:
+                self._stats[model] = ModelStats(model)
+            return self._stats[model]
+
+    def is_small(self, input_data: single_book_suggestion_request) -> bool:
+        text = input_data.extracted_quiz
+        return (
+            count_questions(text) <= settings.ROUTER_SMALL_MAX_QUESTIONS
+            and count_tokens(text, self.small) <= settings.ROUTER_SMALL_MAX_PROMPT_TOKENS
+        )
+
+    def candidates(self, input_data: single_book_suggestion_request) -> List[str]:
+        if not settings.ROUTER_ENABLED:
+            return [self.primary]
+        return list(dict.fromkeys([self.small, self.primary])) if self.is_small(input_data) else [self.primary]
+
+    def route(self, input_data: single_book_suggestion_request, instructions: str) -> RequestPlan:
+        local = plan_local(input_data, self.primary)
+        if local is not None:
+            return local
+
+        plans = [plan_llm(input_data, instructions, model) for model in self.candidates(input_data)]
+        usable = [plan for plan in plans if plan.mode != "rejected"]
+        if not usable:
+            return plans[0]
+
+        healthy = [plan for plan in usable if self.stats(plan.model).healthy] or usable
+        target = settings.ROUTER_LATENCY_TARGET_SECONDS
+        chosen = next(
+            (plan for plan in healthy if self.stats(plan.model).expected_seconds(plan) <= target),
+            None,
+        )
+        if chosen is None:
+            # Slower than the target beats a quiet downgrade of the production model.
+            chosen = next((plan for plan in healthy if plan.model == self.primary), healthy[0])
+            chosen.reason = f"No model is expected to finish within {target:g}s; using {chosen.model}."
+
+        others = [plan for plan in usable if plan is not chosen]
+        others.sort(key=lambda plan: not self.stats(plan.model).healthy)
+        if others:
+            chosen.fallback_model = others[0].model
+        elif self.fallback != chosen.model and plan_llm(input_data, instructions, self.fallback).mode != "rejected":
+            chosen.fallback_model = self.fallback
+        chosen.estimated_seconds = self.stats(chosen.model).expected_seconds(chosen)
+        metrics.increment(f"router.routed.{chosen.model}")
+        return chosen
+
+    def record_success(self, model: str, seconds: float, completion_tokens: int) -> None:
+        stats = self.stats(model)
+        stats.record_success(seconds, completion_tokens)
+        metrics.increment(f"router.{model}.successes")
+        metrics.increment(f"router.{model}.seconds", seconds)
+        self._publish(stats)
+
+    def record_failure(self, model: str, kind: str) -> None:
+        """``kind`` is "timeout", "throttled" or "error"."""
+        stats = self.stats(model)
+        stats.record_failure()
+        metrics.increment(f"router.{model}.{kind}")
+        self._publish(stats)
+
+    def _publish(self, stats: ModelStats) -> None:
+        metrics.set_gauge(f"router.{stats.model}.latency_factor", stats.latency_factor)
+        metrics.set_gauge(f"router.{stats.model}.failure_rate", stats.failure_rate)
@@ -0,0 +1,272 @@
+import importlib.util
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+
+# PDF text extraction libraries. pypdf is a hard dependency and always the
+# fallback; the others are used when installed and calibration picks them.
+# Engines are looked up by name so worker processes can be told which to use.
+
+DEFAULT_PDF_ENGINE = "pypdf"
+
+
+class PdfEngine(ABC):
+    name = ""
+    # Importable module that has to be installed for the engine to be available.
+    module = ""
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    @abstractmethod
+    def open(self, path: str) -> Any:
+        """Open the PDF at ``path``; the result is passed to the other methods."""
+
+    @abstractmethod
+    def page_count(self, document: Any) -> int:
+        ...
+
+    @abstractmethod
+    def page_text(self, document: Any, index: int) -> str:
+        """Text of the zero-based page ``index``."""
+
+    def close(self, document: Any) -> None:
+        pass
+
+
+class PypdfEngine(PdfEngine):
+    name = "pypdf"
+    module = "pypdf"
+
+    def open(self, path: str) -> Any:
+        from pypdf import PdfReader
+
+        return PdfReader(path)
+
+    def page_count(self, document: Any) -> int:
+        return len(document.pages)
+
+    def page_text(self, document: Any, index: int) -> str:
+        return document.pages[index].extract_text()
+
+
+class PyMuPDFEngine(PdfEngine):
+    name = "pymupdf"
+    module = "pymupdf"
+
+    def open(self, path: str) -> Any:
+        import pymupdf
+
+        return pymupdf.open(path)
+
+    def page_count(self, document: Any) -> int:
+        return document.page_count
+
+    def page_text(self, document: Any, index: int) -> str:
+        return document[index].get_text()
+
+    def close(self, document: Any) -> None:
+        document.close()
+
+
+class PdfiumEngine(PdfEngine):
+    name = "pypdfium2"
+    module = "pypdfium2"
+
+    def open(self, path: str) -> Any:
+        import pypdfium2
+
+        return pypdfium2.PdfDocument(path)
+
+    def page_count(self, document: Any) -> int:
+        return len(document)
+
+    def page_text(self, document: Any, index: int) -> str:
+        page = document[index]
+        text_page = page.get_textpage()
+        try:
+            # PDFium separates lines with "\r\n".
+            return text_page.get_text_range().replace("\r\n", "\n")
+        finally:
+            text_page.close()
+            page.close()
+
+    def close(self, document: Any) -> None:
+        document.close()
+
+
+class PdfminerEngine(PdfEngine):
+    name = "pdfminer"
+    module = "pdfminer"
+
+    def open(self, path: str) -> Any:
+        from pdfminer.pdfpage import PDFPage
+
+        file = open(path, "rb")
+        try:
+            return file, list(PDFPage.get_pages(file))
+        except BaseException:
+            file.close()
+            raise
+
+    def page_count(self, document: Any) -> int:
+        return len(document[1])
+
+    def page_text(self, document: Any, index: int) -> str:
+        from io import StringIO
+
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+        output = StringIO()
+        resources = PDFResourceManager()
+        with TextConverter(resources, output, laparams=LAParams()) as converter:
+            PDFPageInterpreter(resources, converter).process_page(document[1][index])
+        # pdfminer ends every page with a form feed.
+        return output.getvalue().rstrip("\x0c")
+
+    def close(self, document: Any) -> None:
+        document[0].close()
+
+
+PDF_ENGINES: Dict[str, PdfEngine] = {
+    engine.name: engine for engine in (PypdfEngine(), PyMuPDFEngine(), PdfiumEngine(), PdfminerEngine())
+}
+
+
+def available_pdf_engines() -> List[str]:
+    return [name for name, engine in PDF_ENGINES.items() if engine.available()]
+
+
+def get_pdf_engine(name: str) -> PdfEngine:
+    """The named engine; raises ImportError if it is unknown or not installed."""
+    engine = PDF_ENGINES.get(name)
+    if engine is None or not engine.available():
+        raise ImportError(f"PDF engine {name!r} is not available.")
+    return engine
+
+
+def engine_text(name: str, path: str) -> str:
+    engine = get_pdf_engine(name)
+    document = engine.open(path)
+    try:
+        return "\n".join(filter(None, (engine.page_text(document, index) for index in range(engine.page_count(document)))))
+    finally:
+        engine.close(document)
+
+
+def _pdf_string(line: str) -> str:
+    return "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def build_text_pdf(pages: List[List[str]]) -> bytes:
+    """A minimal PDF with one Helvetica text block per page (the calibration sample)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", "", "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "\n".join(["BT /F1 10 Tf 12 TL 40 800 Td", *(f"{_pdf_string(line)} Tj T*" for line in lines), "ET"])
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def _sample_quiz_pages(page_count: int = 20, questions_per_page: int = 10) -> Iterator[List[str]]:
+    number = 0
+    for _ in range(page_count):
+        lines = []
+        for _ in range(questions_per_page):
+            number += 1
+            lines.append(f"{number}. Which of these events happens in chapter {number % 40 + 1}?")
+            lines.extend(f"{letter}) Option {letter} for question {number}" for letter in "ABCD")
+            lines.append(f"Answer: {'ABCD'[number % 4]}")
+        yield lines
+
+
+def text_quality(text: str, expected: str) -> float:
+    """Share of the expected words (with multiplicity) that the extracted text contains."""
+    expected_words = Counter(expected.split())
+    if not expected_words:
+        return 0.0
+    return sum((expected_words & Counter(text.split())).values()) / sum(expected_words.values())
+
+
+class EngineCalibration:
+    """How long an engine took on the calibration samples and how faithful its text was."""
+
+    def __init__(self, name: str, seconds: Optional[float] = None, quality: float = 0.0, error: Optional[str] = None):
+        self.name = name
+        self.seconds = seconds
+        self.quality = quality
+        self.error = error
+
+    def passed(self, min_quality: float) -> bool:
+        return self.error is None and self.quality >= min_quality
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"engine": self.name, "seconds": self.seconds, "quality": self.quality, "error": self.error}
+
+
+def calibrate_pdf_engines(
+    engines: List[str], sample_paths: Optional[List[str]] = None, repeat: int = 3
+) -> List[EngineCalibration]:
+    """Time each engine on the samples (best of ``repeat``) and score its text.
+
+    Without ``sample_paths`` a generated quiz PDF with known text is used.
+    For real samples the expected text is what pypdf extracts.
+    """
+    generated = None
+    if not sample_paths:
+        pages = list(_sample_quiz_pages())
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as file:
+            file.write(build_text_pdf(pages))
+        generated = file.name
+        samples = [(generated, "\n".join(line for lines in pages for line in lines))]
+    else:
+        samples = [(path, engine_text(DEFAULT_PDF_ENGINE, path)) for path in sample_paths]
+
+    results = []
+    try:
+        for name in engines:
+            try:
+                best = None
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    texts = [engine_text(name, path) for path, _ in samples]
+                    seconds = time.perf_counter() - started
+                    best = seconds if best is None else min(best, seconds)
+                quality = min(text_quality(text, expected) for text, (_, expected) in zip(texts, samples))
+                results.append(EngineCalibration(name, best, quality))
+            except Exception as exc:
+                results.append(EngineCalibration(name, error=f"{type(exc).__name__}: {exc}"))
+    finally:
+        if generated is not None:
+            os.unlink(generated)
+    return results
+
+
+def choose_pdf_engine(calibrations: List[EngineCalibration], min_quality: float) -> str:
+    """The fastest engine whose text passed the quality check, else pypdf."""
+    passed = [result for result in calibrations if result.passed(min_quality)]
+    if not passed:
+        return DEFAULT_PDF_ENGINE
+    return min(passed, key=lambda result: result.seconds).name
@@ -0,0 +1,74 @@
+import logging
+from typing import Dict, List, Optional
+
+from app.core.metrics import metrics
+from app.core.tokens import count_message_tokens
+from .single_book_suggestion_schema import single_book_suggestion_request
+
+logger = logging.getLogger(__name__)
+
+# OpenAI only caches prompt prefixes of at least this many tokens.
+PROMPT_CACHE_MIN_TOKENS = 1024
+QUIZ_TEXT_HEADER = "Quiz text:\n"
+
+
+class PromptTooLargeError(ValueError):
+    """Raised when a quiz does not fit in the prompt token budget."""
+
+
+class BuiltPrompt:
+    def __init__(self, messages: List[Dict[str, str]], prompt_tokens: int):
+        self.messages = messages
+        self.prompt_tokens = prompt_tokens
+
+
+def assemble_messages(instructions: str, input_data: single_book_suggestion_request) -> List[Dict[str, str]]:
+    """Static instructions first, then everything specific to the book.
+
+    The system message must be byte-identical across requests so providers
+    can serve it from their prompt cache; per-book data only ever appears in
+    the user message after it.
+    """
+    return [
+        {"role": "system", "content": instructions},
+        {
+            "role": "user",
+            "content": (
+                f"Book ID: {input_data.bookId}\n"
+                f"Book name: {input_data.bookName}\n\n"
+                f"{QUIZ_TEXT_HEADER}{input_data.extracted_quiz}"
+            ),
+        },
+    ]
+
+
+def quiz_text_from_message(content: str) -> str:
+    """The quiz text of a user message built by assemble_messages."""
+    _, header, quiz_text = content.partition(QUIZ_TEXT_HEADER)
+    return quiz_text if header else content
+
+
+def build_prompt(
+    instructions: str,
+    input_data: single_book_suggestion_request,
+    max_prompt_tokens: int,
+    model: Optional[str] = None,
+) -> BuiltPrompt:
+    """Assemble the chat messages for one formatting request.
+
+    The instructions go first as the system message and the quiz text is sent
+    exactly once, in the user message. The prompt token count is logged and
+    checked against ``max_prompt_tokens`` before anything is sent.
+    """
+    messages = assemble_messages(instructions, input_data)
+    prompt_tokens = count_message_tokens(messages, model)
+    logger.info(f"Prompt for book {input_data.bookId}: {prompt_tokens} tokens")
+    metrics.increment("prompt.requests")
+    metrics.increment("prompt.tokens", prompt_tokens)
+
+    if prompt_tokens > max_prompt_tokens:
+        metrics.increment("prompt.rejected")
+        raise PromptTooLargeError(
+            f"Quiz prompt is {prompt_tokens} tokens, above the budget of {max_prompt_tokens}."
+        )
+    return BuiltPrompt(messages, prompt_tokens)
@@ -0,0 +1,75 @@
+import json
+import re
+from typing import Any, Dict, List
+
+QUESTIONS_ARRAY_START = re.compile(r'"questions"\s*:\s*\[')
+
+
+class QuestionStreamParser:
+    """Incrementally pull finished question objects out of a streamed quiz JSON document.
+
+    Feed it raw completion deltas; every call returns the question objects whose
+    closing brace arrived in that delta.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = -1
+        # Index just past the closing brace of the most recent complete question.
+        self.last_question_end = 0
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self._buffer += chunk
+        if self._done:
+            return []
+
+        if not self._in_array:
+            match = QUESTIONS_ARRAY_START.search(self._buffer)
+            if not match:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        questions = []
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0 and char == "]":
+                    self._done = True
+                    self._pos += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and char == "}":
+                    questions.append(json.loads(buffer[self._object_start:self._pos + 1]))
+                    self._object_start = -1
+                    self.last_question_end = self._pos + 1
+            self._pos += 1
+        return questions
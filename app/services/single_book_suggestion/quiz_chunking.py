@@ -0,0 +1,87 @@
+import re
+from typing import Iterable, List
+
+from .single_book_suggestion_schema import quiz_question
+
+# A line that starts a new question: "1.", "12)", "Q3:", "Question 4 -" ...
+QUESTION_START = re.compile(r"^\s*(?:Q(?:uestion)?\s*)?\d{1,4}\s*[.):\-]", re.IGNORECASE)
+# Questions on each side of a chunk boundary compared for duplicates when merging.
+BOUNDARY_OVERLAP = 2
+
+
+def split_question_blocks(text: str) -> List[str]:
+    """Split quiz text into blocks that each start at a question stem.
+
+    Text before the first detected question (titles, instructions) stays attached
+    to the first block.
+    """
+    blocks: List[List[str]] = []
+    current: List[str] = []
+    has_question = False
+    for line in text.splitlines():
+        if QUESTION_START.match(line):
+            if has_question:
+                blocks.append(current)
+                current = []
+            has_question = True
+        current.append(line)
+    if current:
+        blocks.append(current)
+    return ["\n".join(block).strip() for block in blocks if "".join(block).strip()]
+
+
+def split_quiz_text(text: str, max_chars: int) -> List[str]:
+    """Group question blocks into chunks of at most ``max_chars`` characters.
+
+    A single block longer than ``max_chars`` becomes its own chunk rather than
+    being cut mid-question.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for block in split_question_blocks(text):
+        if current and size + len(block) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def _question_fingerprint(question: quiz_question) -> str:
+    """Stem and options, so repeated generic stems ("Choose the correct answer.") stay distinct."""
+    content = _normalize(QUESTION_START.sub("", question.content))
+    if not content:
+        return ""
+    return "\n".join([content, *(_normalize(option) for option in question.options)])
+
+
+def merge_questions(question_lists: Iterable[List[quiz_question]]) -> List[quiz_question]:
+    """Concatenate per-chunk questions and renumber from 1.
+
+    The model sometimes repeats the question on the other side of a chunk
+    boundary, so leading questions of a chunk that match one of the last
+    BOUNDARY_OVERLAP questions of the previous chunk are dropped. Repeats
+    elsewhere in the quiz are kept.
+    """
+    merged: List[quiz_question] = []
+    previous_tail: List[str] = []
+    for questions in question_lists:
+        questions = list(questions)
+        skip = 0
+        while skip < len(questions) and skip < BOUNDARY_OVERLAP:
+            fingerprint = _question_fingerprint(questions[skip])
+            if not fingerprint or fingerprint not in previous_tail:
+                break
+            skip += 1
+        for question in questions[skip:]:
+            merged.append(question.model_copy(update={"questionNo": len(merged) + 1}))
+        if questions:
+            previous_tail = [_question_fingerprint(question) for question in questions[-BOUNDARY_OVERLAP:]]
+    return merged
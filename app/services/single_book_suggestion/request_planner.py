@@ -0,0 +1,176 @@
+import math
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.model_catalog import ModelProfile, get_model_profile
+from app.core.tokens import count_message_tokens, count_tokens
+from .local_quiz_parser import LocalParseResult, parse_quiz
+from .prompt_builder import assemble_messages
+from .quiz_chunking import QUESTION_START, split_quiz_text
+from .single_book_suggestion_schema import single_book_suggestion_request
+
+# Average size of one formatted question object (stem, options and answers) in the output JSON.
+TOKENS_PER_QUESTION = 70
+RESPONSE_OVERHEAD_TOKENS = 40
+REQUEST_OVERHEAD_SECONDS = 1.5
+MIN_CHUNK_CHARS = 500
+
+
+class RequestPlan:
+    """How a formatting request will be served and what it is expected to cost.
+
+    ``mode`` is one of "local" (rule-based parser, no LLM call), "single",
+    "chunked" or "rejected".
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        model: str,
+        question_count: int,
+        prompt_tokens: int = 0,
+        estimated_output_tokens: int = 0,
+        estimated_seconds: float = 0.0,
+        estimated_cost_usd: float = 0.0,
+        chunks: Optional[List[str]] = None,
+        reason: str = "",
+        local_result: Optional[LocalParseResult] = None,
+        fallback_model: Optional[str] = None,
+    ):
+        self.mode = mode
+        self.model = model
+        self.question_count = question_count
+        self.prompt_tokens = prompt_tokens
+        self.estimated_output_tokens = estimated_output_tokens
+        self.estimated_seconds = estimated_seconds
+        self.estimated_cost_usd = estimated_cost_usd
+        self.chunks = chunks or []
+        self.reason = reason
+        self.local_result = local_result
+        # Model to switch to when the chosen one times out or is rate limited.
+        self.fallback_model = fallback_model
+
+    @property
+    def models(self) -> List[str]:
+        """The chosen model followed by its fallback, in the order they are tried."""
+        return [self.model] + ([self.fallback_model] if self.fallback_model else [])
+
+    def to_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "model": self.model,
+            "fallback_model": self.fallback_model,
+            "question_count": self.question_count,
+            "chunk_count": len(self.chunks),
+            "prompt_tokens": self.prompt_tokens,
+            "estimated_output_tokens": self.estimated_output_tokens,
+            "estimated_seconds": round(self.estimated_seconds, 2),
+            "estimated_cost_usd": round(self.estimated_cost_usd, 6),
+            "reason": self.reason,
+        }
+
+
+def count_questions(text: str) -> int:
+    return sum(1 for line in text.splitlines() if QUESTION_START.match(line))
+
+
+def estimate_output_tokens(text: str, model: str) -> int:
+    """Estimate completion tokens from the number of question stems in ``text``."""
+    questions = count_questions(text)
+    if questions:
+        return RESPONSE_OVERHEAD_TOKENS + questions * TOKENS_PER_QUESTION
+    # No recognisable stems: assume the JSON restates the text at roughly its own size.
+    return RESPONSE_OVERHEAD_TOKENS + count_tokens(text, model)
+
+
+def plan_request(input_data: single_book_suggestion_request, instructions: str, model: str) -> RequestPlan:
+    """Choose between the local parser, one completion, chunked completions or rejection."""
+    return plan_local(input_data, model) or plan_llm(input_data, instructions, model)
+
+
+def plan_local(input_data: single_book_suggestion_request, model: str) -> Optional[RequestPlan]:
+    """Return a "local" plan when the rule-based parser is confident enough, else None."""
+    if not settings.LOCAL_PARSER_ENABLED:
+        return None
+    result = parse_quiz(input_data.extracted_quiz)
+    if result.confidence < settings.LOCAL_PARSER_MIN_CONFIDENCE:
+        return None
+    return RequestPlan(
+        "local",
+        model,
+        len(result.questions),
+        reason=f"Parsed locally as '{result.dialect}' with confidence {result.confidence}.",
+        local_result=result,
+    )
+
+
+def plan_llm(input_data: single_book_suggestion_request, instructions: str, model: str) -> RequestPlan:
+    """Plan formatting with ``model``: one completion, chunked completions or rejection."""
+    text = input_data.extracted_quiz
+    question_count = count_questions(text)
+    profile = get_model_profile(model)
+    max_chars = settings.CHUNK_MAX_CHARS
+    while True:
+        chunks = [text]
+        if settings.CHUNKING_ENABLED and len(text) > max_chars:
+            chunks = split_quiz_text(text, max_chars)
+        plan = _plan_chunks(input_data, chunks, instructions, model, profile, question_count)
+        # Dense quizzes can fit the prompt budget but not the output window; retry with smaller chunks.
+        if plan.mode != "rejected" or not settings.CHUNKING_ENABLED or max_chars <= MIN_CHUNK_CHARS:
+            return plan
+        max_chars //= 2
+
+
+def _plan_chunks(
+    input_data: single_book_suggestion_request,
+    chunks: List[str],
+    instructions: str,
+    model: str,
+    profile: ModelProfile,
+    question_count: int,
+) -> RequestPlan:
+    prompt_tokens = 0
+    output_tokens = 0
+    cost = 0.0
+    slowest_chunk = 0.0
+    for chunk in chunks:
+        chunk_input = input_data.model_copy(update={"extracted_quiz": chunk})
+        chunk_prompt = count_message_tokens(assemble_messages(instructions, chunk_input), model)
+        chunk_output = estimate_output_tokens(chunk, model)
+        prompt_tokens += chunk_prompt
+        output_tokens += chunk_output
+        cost += profile.cost(chunk_prompt, chunk_output)
+        slowest_chunk = max(
+            slowest_chunk,
+            REQUEST_OVERHEAD_SECONDS + chunk_output / profile.output_tokens_per_second,
+        )
+
+        if chunk_prompt > settings.MAX_PROMPT_TOKENS:
+            reason = f"A prompt of {chunk_prompt} tokens exceeds the budget of {settings.MAX_PROMPT_TOKENS}."
+        elif chunk_output > profile.max_output_tokens or chunk_prompt + chunk_output > profile.context_window:
+            reason = f"About {chunk_output} output tokens do not fit in the {model} context window."
+        else:
+            continue
+        if not settings.CHUNKING_ENABLED:
+            reason += " Enable chunking to split the quiz."
+        return RequestPlan(
+            "rejected",
+            model,
+            question_count,
+            prompt_tokens=prompt_tokens,
+            estimated_output_tokens=output_tokens,
+            chunks=chunks,
+            reason=reason,
+        )
+
+    waves = math.ceil(len(chunks) / settings.CHUNK_MAX_CONCURRENCY)
+    return RequestPlan(
+        "chunked" if len(chunks) > 1 else "single",
+        model,
+        question_count,
+        prompt_tokens=prompt_tokens,
+        estimated_output_tokens=output_tokens,
+        estimated_seconds=slowest_chunk * waves,
+        estimated_cost_usd=cost,
+        chunks=chunks,
+    )
@@ -1,66 +1,713 @@
 import os
 import json
-import openai
 from uuid import uuid4
 import asyncio
 from dotenv import load_dotenv
 import concurrent.futures
-from .single_book_suggestion_schema import single_book_suggestion_response, single_book_suggestion_request
+from .single_book_suggestion_schema import quiz_question, single_book_suggestion_response, single_book_suggestion_request
+from .question_stream import QuestionStreamParser
+from .local_quiz_parser import parse_quiz
+from .json_repair import QuizJSONError, RepairedQuiz, repair_quiz_json, validate_questions
+from .prompt_builder import (
+    PROMPT_CACHE_MIN_TOKENS,
+    BuiltPrompt,
+    PromptTooLargeError,
+    build_prompt,
+    quiz_text_from_message,
+)
+from .quiz_chunking import merge_questions, split_question_blocks
+from .model_router import ModelRouter
+from .request_planner import RequestPlan
 import datetime
-from openai import AsyncOpenAI
+import logging
+import re
+import time
+import unicodedata
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.core.adaptive_limiter import AdaptiveLimiter
+from app.core.cache import TieredCache, content_hash
+from app.core.config import settings
+from app.core.hedging import Hedger
+from app.core.llm import (
+    LLMError,
+    LLMRateLimitError,
+    LLMResult,
+    LLMStream,
+    LLMTimeoutError,
+    LLMTransientError,
+    PrefetchedStream,
+    completion_deadline,
+)
+from app.core.llm_backends import create_backend
+from app.core.model_catalog import get_model_profile
+from app.core.rate_limiter import SharedTokenBucket
+from app.core.tokens import count_message_tokens, count_tokens
+from app.core.metrics import RATE_BUCKETS, TOKEN_BUCKETS, metrics
+from app.core.telemetry import record_timing
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Bump whenever create_prompt changes so cached responses from older prompts are ignored.
+PROMPT_VERSION = 3
+
+
+def normalize_quiz_text(text: str) -> str:
+    """Normalize quiz text so cosmetic whitespace differences share a cache entry."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def stub_quiz_reply(messages: List[Dict[str, str]]) -> str:
+    """Reply of the offline stub backend: the rule-based parse of the quiz in the last message."""
+    quiz_text = quiz_text_from_message(messages[-1]["content"])
+    return json.dumps({"questions": parse_quiz(quiz_text).questions}, ensure_ascii=False)
+
+
 class AISuggestion:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
+        self.backend = create_backend(stub_quiz_reply)
+        # OpenAI rate limits are per model, so each routed model gets its own limiter.
+        self.limiters: Dict[str, AdaptiveLimiter] = {}
+        self.rate_limiter = SharedTokenBucket(
+            Path(settings.RATE_LIMIT_DB),
+            settings.OPENAI_API_KEY or "",
+            requests_per_minute=settings.OPENAI_RPM,
+            tokens_per_minute=settings.OPENAI_TPM,
+        )
+        self.model = settings.OPENAI_MODEL
+        self.router = ModelRouter(
+            self.model,
+            small=settings.ROUTER_SMALL_MODEL,
+            fallback=settings.ROUTER_FALLBACK_MODEL,
+        )
+        prefix_tokens = count_tokens(self.create_prompt(), self.model)
+        metrics.set_gauge("prompt_cache.prefix_tokens", prefix_tokens)
+        if prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+            logger.info(
+                f"Static prompt prefix is {prefix_tokens} tokens; providers cache prefixes of "
+                f"{PROMPT_CACHE_MIN_TOKENS}+ tokens, so cached_tokens stays 0 until it grows."
+            )
+        self.hedger = Hedger(
+            "hedge",
+            percentile=settings.HEDGE_PERCENTILE,
+            default_delay=settings.HEDGE_DEFAULT_DELAY_SECONDS,
+            min_delay=settings.HEDGE_MIN_DELAY_SECONDS,
+            budget_per_minute=settings.HEDGE_BUDGET_PER_MINUTE,
+        )
+        self.cache = TieredCache(
+            "response_cache",
+            Path(settings.RESPONSE_CACHE_DIR),
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+        )
+
+    async def warm_up(self) -> None:
+        await self.backend.warm_up(settings.LLM_HTTP_WARMUP_CONNECTIONS)
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+    def limiter(self, model: str) -> AdaptiveLimiter:
+        if model not in self.limiters:
+            self.limiters[model] = AdaptiveLimiter(
+                f"llm_limiter.{model}",
+                initial=settings.LLM_CONCURRENCY_INITIAL,
+                min_limit=settings.LLM_CONCURRENCY_MIN,
+                max_limit=settings.LLM_CONCURRENCY_MAX,
+            )
+        return self.limiters[model]
+
+    def request_key(self, input_data: single_book_suggestion_request) -> str:
+        """Identifies the formatting request whichever model ends up serving it."""
+        return content_hash(
+            normalize_quiz_text(input_data.extracted_quiz),
+            input_data.bookId,
+            input_data.bookName,
+            PROMPT_VERSION,
+        )
+
+    def cache_key(self, input_data: single_book_suggestion_request, model: str) -> str:
+        """Cached responses are kept per routed model."""
+        return content_hash(self.request_key(input_data), model)
+
+    async def _cached_response(
+        self, input_data: single_book_suggestion_request, plan: RequestPlan
+    ) -> Optional[single_book_suggestion_response]:
+        """Look up an LLM plan's response off the event loop; local and rejected plans are never cached."""
+        if plan.mode in ("local", "rejected"):
+            return None
+        cached = await asyncio.to_thread(self.cache.get, self.cache_key(input_data, plan.model))
+        return None if cached is None else single_book_suggestion_response.model_validate(cached)
+
+    async def _cache_response(
+        self,
+        input_data: single_book_suggestion_request,
+        plan: RequestPlan,
+        response: single_book_suggestion_response,
+        seconds: float = 0.0,
+        tokens: int = 0,
+    ) -> None:
+        key = self.cache_key(input_data, plan.model)
+        await asyncio.to_thread(self.cache.put, key, response.model_dump(), seconds, tokens)
+
+    def completion_timeout(self, plan: RequestPlan) -> float:
+        """Per-attempt timeout: the plan's latency estimate with headroom, at least LLM_TIMEOUT_SECONDS."""
+        return max(settings.LLM_TIMEOUT_SECONDS, plan.estimated_seconds * settings.LLM_TIMEOUT_ESTIMATE_FACTOR)
+
     async def get_suggestion(self, input_data: single_book_suggestion_request) -> single_book_suggestion_response:
-            prompt = self.create_prompt(input_data)
-            response_text = await self.get_openai_response(prompt, input_data)
-            response_json = json.loads(response_text)
-            return single_book_suggestion_response(**response_json)            
+            plan = self.plan(input_data)
+            cached = await self._cached_response(input_data, plan)
+            if cached is not None:
+                return cached
+
+            self._record_plan(plan)
+            if plan.mode == "local":
+                return self._local_response(input_data, plan)
+            if plan.mode == "rejected":
+                raise PromptTooLargeError(plan.reason)
+
+            started = time.perf_counter()
+            if plan.mode == "chunked":
+                response, total_tokens = await self._format_chunks(input_data, plan)
+            else:
+                response, total_tokens = await self._format(input_data, plan)
+            await self._cache_response(input_data, plan, response, time.perf_counter() - started, total_tokens)
+            return response
+
+    async def get_suggestions_batch(
+        self, inputs: Dict[str, single_book_suggestion_request]
+    ) -> Dict[str, Any]:
+        """Format many quizzes through one OpenAI Batch API job.
+
+        Cached and locally parsed quizzes are answered directly; every other
+        quiz, or each chunk of a long one, becomes one line of the batch.
+        Backends without a batch API run the lines as ordinary completions.
+        The result maps each input key to its response or to the exception it
+        failed with.
+        """
+        results: Dict[str, Any] = {}
+        pending: Dict[str, Tuple[single_book_suggestion_request, RequestPlan]] = {}
+        batch_requests = {}
+        request_plans: Dict[str, RequestPlan] = {}
+        for custom_id, input_data in inputs.items():
+            plan = self.plan(input_data)
+            cached = await self._cached_response(input_data, plan)
+            if cached is not None:
+                results[custom_id] = cached
+                continue
+
+            self._record_plan(plan)
+            if plan.mode == "local":
+                results[custom_id] = self._local_response(input_data, plan)
+                continue
+            if plan.mode == "rejected":
+                results[custom_id] = PromptTooLargeError(plan.reason)
+                continue
+
+            pending[custom_id] = (input_data, plan)
+            for index, chunk in enumerate(plan.chunks):
+                chunk_input = input_data.model_copy(update={"extracted_quiz": chunk})
+                batch_requests[f"{custom_id}:{index}"] = {
+                    "model": plan.model,
+                    "messages": self.build_messages(chunk_input, plan.model).messages,
+                    **self.completion_options(plan.model),
+                }
+                request_plans[f"{custom_id}:{index}"] = plan
+
+        if not batch_requests:
+            return results
+
+        if self.backend.batch_api:
+            try:
+                outputs = await self.backend.run_batch(batch_requests, settings.BATCH_TIMEOUT_SECONDS)
+            except LLMTimeoutError as exc:
+                outputs = dict.fromkeys(batch_requests, exc)
+        else:
+            outputs = await self._complete_each(batch_requests, request_plans)
+        for custom_id, (input_data, plan) in pending.items():
+            try:
+                question_lists = []
+                total_tokens = 0
+                for index in range(len(plan.chunks)):
+                    result = outputs[f"{custom_id}:{index}"]
+                    if isinstance(result, Exception):
+                        raise result
+                    repaired = repair_quiz_json(result.text)
+                    if not repaired.complete:
+                        raise QuizJSONError(f"Batch output was truncated after {len(repaired.questions)} questions.")
+                    question_lists.append(repaired.questions)
+                    total_tokens += result.total_tokens
+                    if self.backend.batch_api:
+                        # Ordinary completions were recorded by _completion.
+                        self._record_completion(plan.model, result)
+
+                response = single_book_suggestion_response(
+                    bookId=input_data.bookId,
+                    bookName=input_data.bookName,
+                    questions=merge_questions(question_lists) if len(question_lists) > 1 else question_lists[0],
+                )
+                await self._cache_response(input_data, plan, response, tokens=total_tokens)
+                results[custom_id] = response
+            except Exception as exc:
+                results[custom_id] = exc
+        return results
+
+    async def _complete_each(
+        self, requests: Dict[str, Dict[str, Any]], plans: Dict[str, RequestPlan]
+    ) -> Dict[str, Any]:
+        """Run batch lines as ordinary completions; returns an LLMResult or LLMError per custom_id.
+
+        Each goes through _completion, so the adaptive limiter, the shared token
+        bucket, retries and model fallback apply as for any other call.
+        """
+
+        async def run(custom_id: str) -> Any:
+            plan = plans[custom_id]
+            try:
+                return await self.get_openai_response(
+                    requests[custom_id]["messages"], plan.models, self.completion_timeout(plan)
+                )
+            except LLMError as exc:
+                return exc
+
+        outputs = await asyncio.gather(*(run(custom_id) for custom_id in requests))
+        return dict(zip(requests, outputs))
+
+    def plan(self, input_data: single_book_suggestion_request) -> RequestPlan:
+        """Decide how a request will be served before any tokens are spent."""
+        return self.router.route(input_data, self.create_prompt())
+
+    def _record_plan(self, plan: RequestPlan) -> None:
+        metrics.increment(f"planner.{plan.mode}")
+        if plan.mode == "local":
+            metrics.increment("local_parser.local")
+            metrics.increment(f"local_parser.dialect.{plan.local_result.dialect}")
+        elif settings.LOCAL_PARSER_ENABLED:
+            metrics.increment("local_parser.llm_fallback")
+
+    def _local_response(
+        self, input_data: single_book_suggestion_request, plan: RequestPlan
+    ) -> single_book_suggestion_response:
+        return single_book_suggestion_response(
+            bookId=input_data.bookId,
+            bookName=input_data.bookName,
+            questions=validate_questions(plan.local_result.questions),
+        )
+
+    def build_messages(self, input_data: single_book_suggestion_request, model: Optional[str] = None) -> BuiltPrompt:
+        return build_prompt(self.create_prompt(), input_data, settings.MAX_PROMPT_TOKENS, model or self.model)
+
+    async def _format(
+        self, input_data: single_book_suggestion_request, plan: RequestPlan, depth: int = 0
+    ) -> Tuple[single_book_suggestion_response, int]:
+        prompt = self.build_messages(input_data, plan.model)
+        result = await self.get_openai_response(prompt.messages, plan.models, self.completion_timeout(plan))
+        repaired = repair_quiz_json(result.text)
+        if repaired.repaired:
+            metrics.increment("json_repair.repaired")
+
+        questions = repaired.questions
+        total_tokens = result.total_tokens
+        if not repaired.complete:
+            # Only the questions the model did not get to are requested again.
+            metrics.increment("json_repair.truncated")
+            if not questions or depth >= settings.MAX_CONTINUATIONS:
+                raise QuizJSONError(f"Model output was truncated after {len(questions)} questions.")
+
+            tail = self._missing_tail(input_data.extracted_quiz, len(questions))
+            if tail is not None:
+                tail_response, tail_tokens = await self._format(
+                    input_data.model_copy(update={"extracted_quiz": tail}), plan, depth + 1
+                )
+                tail_questions = tail_response.questions
+            else:
+                tail_questions, tail_tokens = await self._continue(prompt.messages, repaired, plan)
+            metrics.increment("json_repair.continuations")
+            questions = merge_questions([questions, tail_questions])
+            total_tokens += tail_tokens
+
+        response = single_book_suggestion_response(
+            bookId=input_data.bookId,
+            bookName=input_data.bookName,
+            questions=questions,
+        )
+        return response, total_tokens
+
+    def _missing_tail(self, quiz_text: str, formatted_count: int) -> Optional[str]:
+        """Return the source text of the questions after the first ``formatted_count``, if they can be located."""
+        blocks = split_question_blocks(quiz_text)
+        if 0 < formatted_count < len(blocks):
+            return "\n".join(blocks[formatted_count:])
+        return None
+
+    async def _continue(
+        self, messages: List[Dict[str, str]], repaired: RepairedQuiz, plan: RequestPlan
+    ) -> Tuple[List[quiz_question], int]:
+        """Ask the model to continue its own truncated output from the next question."""
+        next_question = len(repaired.questions) + 1
+        follow_up = messages + [
+            {"role": "assistant", "content": repaired.partial_text},
+            {
+                "role": "user",
+                "content": (
+                    f"Your output was cut off. Continue from question {next_question}: reply with a JSON "
+                    f'object whose "questions" array holds only questions {next_question} onwards.'
+                ),
+            },
+        ]
+        result = await self.get_openai_response(follow_up, plan.models, self.completion_timeout(plan))
+        continuation = repair_quiz_json(result.text)
+        if not continuation.complete:
+            count = len(repaired.questions) + len(continuation.questions)
+            raise QuizJSONError(f"Model output was truncated again after {count} questions.")
+        return continuation.questions, result.total_tokens
+
+    async def _format_chunks(
+        self, input_data: single_book_suggestion_request, plan: RequestPlan
+    ) -> Tuple[single_book_suggestion_response, int]:
+        """Format every chunk through its own completion concurrently, then merge."""
+        semaphore = asyncio.Semaphore(settings.CHUNK_MAX_CONCURRENCY)
+
+        async def format_chunk(chunk: str):
+            async with semaphore:
+                return await self._format(input_data.model_copy(update={"extracted_quiz": chunk}), plan)
+
+        metrics.increment("chunking.chunked_requests")
+        metrics.increment("chunking.chunks", len(plan.chunks))
+        results = await asyncio.gather(*(format_chunk(chunk) for chunk in plan.chunks))
+        questions = merge_questions(response.questions for response, _ in results)
+        response = single_book_suggestion_response(
+            bookId=input_data.bookId,
+            bookName=input_data.bookName,
+            questions=questions,
+        )
+        return response, sum(tokens for _, tokens in results)
+
+    async def stream_suggestion(self, input_data: single_book_suggestion_request) -> AsyncIterator[quiz_question]:
+        """Yield formatted questions one by one as the completion streams in.
+
+        A chunked quiz streams its first chunk while the other chunks are
+        formatted concurrently; those are emitted in order once each is ready.
+        """
+        plan = self.plan(input_data)
+        cached = await self._cached_response(input_data, plan)
+        if cached is not None:
+            for question in cached.questions:
+                yield question
+            return
+
+        self._record_plan(plan)
+        if plan.mode == "rejected":
+            raise PromptTooLargeError(plan.reason)
+        if plan.mode == "local":
+            for question in self._local_response(input_data, plan).questions:
+                yield question
+            return
+
+        started = time.perf_counter()
+        chunk_inputs = [input_data]
+        if plan.mode == "chunked":
+            metrics.increment("chunking.chunked_requests")
+            metrics.increment("chunking.chunks", len(plan.chunks))
+            chunk_inputs = [input_data.model_copy(update={"extracted_quiz": chunk}) for chunk in plan.chunks]
+        # The first chunk's stream takes one of the CHUNK_MAX_CONCURRENCY completions.
+        semaphore = asyncio.Semaphore(max(1, settings.CHUNK_MAX_CONCURRENCY - 1))
+
+        async def format_chunk(chunk_input: single_book_suggestion_request):
+            async with semaphore:
+                return await self._format(chunk_input, plan)
+
+        later = [asyncio.ensure_future(format_chunk(chunk_input)) for chunk_input in chunk_inputs[1:]]
+        chunk_questions: List[List[quiz_question]] = [[]]
+        questions: List[quiz_question] = []
+        token_counts: List[int] = []
+        try:
+            async for question in self._stream_format(chunk_inputs[0], plan, token_counts):
+                chunk_questions[0].append(question)
+                questions.append(question.model_copy(update={"questionNo": len(questions) + 1}))
+                yield questions[-1]
+            for task in later:
+                response, tokens = await task
+                token_counts.append(tokens)
+                chunk_questions.append(response.questions)
+                # Leading questions that repeat the end of the previous chunk are dropped.
+                for question in merge_questions(chunk_questions)[len(questions):]:
+                    questions.append(question)
+                    yield question
+        finally:
+            for task in later:
+                task.cancel()
+
+        response = single_book_suggestion_response(
+            bookId=input_data.bookId,
+            bookName=input_data.bookName,
+            questions=questions,
+        )
+        await self._cache_response(input_data, plan, response, time.perf_counter() - started, sum(token_counts))
+
+    async def _stream_format(
+        self, input_data: single_book_suggestion_request, plan: RequestPlan, token_counts: List[int]
+    ) -> AsyncIterator[quiz_question]:
+        """Stream the questions of one completion, continuing a truncated answer.
+
+        The tokens spent are appended to ``token_counts``.
+        """
+        prompt = self.build_messages(input_data, plan.model)
+        parser = QuestionStreamParser()
+        questions = []
+        completion_tokens = 0
+
+        stream_started = time.perf_counter()
+        timeout = self.completion_timeout(plan)
+        async with self._completion(plan.models, prompt.messages, timeout, stream=True) as (model, stream):
+            async for text in stream:
+                for question in validate_questions(parser.feed(text)):
+                    questions.append(question)
+                    yield question
+        if stream.result is not None:
+            token_counts.append(stream.result.total_tokens)
+            completion_tokens = stream.result.completion_tokens
+        self.router.record_success(model, time.perf_counter() - stream_started, completion_tokens)
+
+        if not parser.done:
+            # Truncated output: format only the remaining questions and keep numbering continuous.
+            metrics.increment("json_repair.truncated")
+            tail = self._missing_tail(input_data.extracted_quiz, len(questions))
+            if tail is None:
+                raise QuizJSONError(f"Model output was truncated after {len(questions)} questions.")
+            tail_response, tail_tokens = await self._format(
+                input_data.model_copy(update={"extracted_quiz": tail}), plan, 1
+            )
+            metrics.increment("json_repair.continuations")
+            token_counts.append(tail_tokens)
+            # Tail questions that repeat the last ones already emitted are dropped; the rest are renumbered.
+            merged = merge_questions([questions, tail_response.questions])
+            for question in merged[len(questions):]:
+                questions.append(question)
+                yield question
     
-    def create_prompt(self, input_data: single_book_suggestion_request) ->str:
-        return f"""Your task is arranging the quiz you get from the text into a proper json format.
+    def create_prompt(self) ->str:
+        # Identical for every request so it forms a prompt-cacheable prefix; book data goes in the user message.
+        return """Your task is arranging the quiz you get from the text into a proper json format.
 
-                   The quiz content is for book ID: {input_data.bookId} (integer) and book name: "{input_data.bookName}"
+                   The user message gives the book ID and book name, followed by the quiz text.
 
                    Example output:
-                   {{   "bookId": {input_data.bookId},
-                        "bookName": "{input_data.bookName}",
-                        "questions": [
-                            {{
+                   {   "questions": [
+                            {
                             "questionNo": 1,
                             "content": "What is 2 + 2?",
                             "options": ["1", "2", "3", "4"],
                             "correctAnswers": ["4"]
-                            }},
-                            {{
+                            },
+                            {
                             "questionNo": 2,
                             "content": "Which are prime numbers?",
                             "options": ["2", "3", "4", "6"],
                             "correctAnswers": ["2", "3"]
-                            }}
+                            }
                         ]
-                        }}
+                        }
                         
-                   Please process the following quiz text and format it according to the example above:
-                   {input_data.extracted_quiz}
+                   Please format the quiz text in the user message according to the example above.
                 """
 
 
-    async def get_openai_response(self, prompt: str, data: dict) -> single_book_suggestion_response:
-        data_json = data.json()
+    def completion_options(self, model: str) -> Dict[str, Any]:
+        """Extra chat completion arguments; JSON mode where the model supports it."""
+        if settings.OPENAI_JSON_MODE and get_model_profile(model).supports_json_mode:
+            return {"response_format": {"type": "json_object"}}
+        return {}
 
-        completion = await self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": data_json}
-            ]
-        )
+    @asynccontextmanager
+    async def _completion(
+        self, models: List[str], messages: List[Dict[str, str]], timeout: float, stream: bool = False
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Run one chat completion under the adaptive limiter of the model used.
+
+        Throttled (429) and transient server errors are retried here rather than
+        inside the backend so the limiter sees every one of them. A timeout or
+        throttle moves the remaining attempts to the next model in ``models``.
+        Each attempt also draws from the cross-process token bucket. Yields the
+        model that answered and its LLMResult, or an LLMStream whose slot is
+        held until the stream is consumed.
+        """
+        # The reply restates the quiz as JSON, so budget roughly the user message again for output.
+        estimated_tokens = count_message_tokens(messages, models[0]) + count_tokens(messages[-1]["content"], models[0])
+        model_index = 0
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            model = models[model_index]
+            limiter = self.limiter(model)
+            retry_delay = 0
+            async with limiter.slot() as slot_wait:
+                queue_wait = slot_wait + await self.rate_limiter.acquire(estimated_tokens)
+                started = time.perf_counter()
+                try:
+                    try:
+                        response = await self._call(model, messages, stream, estimated_tokens, timeout)
+                    except LLMError:
+                        # Throttled and failed attempts are not billed; give their tokens back to the quota.
+                        await self.rate_limiter.reconcile(estimated_tokens, 0)
+                        raise
+                except LLMRateLimitError as exc:
+                    limiter.on_throttle(exc.headers)
+                    self.router.record_failure(model, "throttled")
+                    if attempt == settings.LLM_MAX_RETRIES:
+                        raise
+                    model_index = self._next_model(models, model_index)
+                    continue
+                except LLMTimeoutError:
+                    self.router.record_failure(model, "timeout")
+                    if attempt == settings.LLM_MAX_RETRIES:
+                        raise
+                    next_index = self._next_model(models, model_index)
+                    if next_index == model_index:
+                        retry_delay = 2 ** attempt
+                    model_index = next_index
+                except LLMTransientError:
+                    self.router.record_failure(model, "error")
+                    if attempt == settings.LLM_MAX_RETRIES:
+                        raise
+                    retry_delay = 2 ** attempt
+                else:
+                    limiter.on_success(response.headers)
+                    if stream:
+                        try:
+                            yield model, response
+                        finally:
+                            await response.aclose()
+                        if response.result is not None:
+                            self._record_completion(model, response.result, queue_wait, time.perf_counter() - started)
+                            await self.rate_limiter.reconcile(estimated_tokens, response.result.total_tokens or None)
+                        return
+                    duration = time.perf_counter() - started
+                    self.router.record_success(model, duration, response.completion_tokens)
+                    self._record_completion(model, response, queue_wait, duration)
+                    await self.rate_limiter.reconcile(estimated_tokens, response.total_tokens or None)
+                    yield model, response
+                    return
+            await asyncio.sleep(retry_delay)
+
+    async def _call(
+        self, model: str, messages: List[Dict[str, str]], stream: bool, estimated_tokens: int, timeout: float
+    ) -> Any:
+        """One backend call, hedged when HEDGING_ENABLED.
+
+        Calls always stream so time to first token is observed for every
+        completion; non-streaming callers get the collected LLMResult.
+        """
+        options = self.completion_options(model)
+        attempts = 0
+
+        async def attempt(first_token: asyncio.Event) -> Any:
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                # _completion holds the first attempt's limiter slot and tokens.
+                return await call(first_token)
+            # A hedge is one more call in flight: it takes its own slot and tokens, and its
+            # throttles count towards the limit. Whichever attempt wins, _completion reconciles
+            # one estimate against the billed tokens, so the hedge's estimate is always refunded.
+            limiter = self.limiter(model)
+            async with limiter.slot():
+                await self.rate_limiter.acquire(estimated_tokens)
+                try:
+                    return await call(first_token)
+                except LLMRateLimitError as exc:
+                    limiter.on_throttle(exc.headers)
+                    raise
+                finally:
+                    await self.rate_limiter.reconcile(estimated_tokens, 0)
+
+        async def call(first_token: asyncio.Event) -> Any:
+            started = time.perf_counter()
+            # ``timeout`` bounds the whole attempt, including a stream the caller consumes later.
+            deadline = asyncio.get_running_loop().time() + timeout
+            async with completion_deadline(deadline):
+                response = await self.backend.stream(model, messages, timeout, **options)
+            try:
+                iterator = response.__aiter__()
+                async with completion_deadline(deadline):
+                    first = await anext(iterator, "")
+                first_token.set()
+                response = PrefetchedStream(response, iterator, first, time.perf_counter() - started, deadline)
+                if stream:
+                    return response
+                async for _ in response:
+                    pass
+            except BaseException:
+                await response.aclose()
+                raise
+            result = response.result
+            return LLMResult(
+                result.text.strip(),
+                finish_reason=result.finish_reason,
+                prompt_tokens=result.prompt_tokens,
+                completion_tokens=result.completion_tokens,
+                headers=response.headers,
+                cached_tokens=result.cached_tokens,
+                first_token_seconds=response.first_token_seconds,
+            )
+
+        if not settings.HEDGING_ENABLED:
+            return await attempt(asyncio.Event())
+        return await self.hedger.run(model, attempt, discard=self._discard)
+
+    async def _discard(self, response: Any) -> None:
+        if isinstance(response, LLMStream):
+            await response.aclose()
+
+    def _record_completion(
+        self,
+        model: str,
+        result: LLMResult,
+        queue_wait: Optional[float] = None,
+        duration: Optional[float] = None,
+    ) -> None:
+        """Record token usage and timings of one completion as histograms and Server-Timing entries.
+
+        Prompt-cache hits are also counted per model so latency and cost savings can be checked.
+        """
+        metrics.observe("llm.prompt_tokens", result.prompt_tokens, TOKEN_BUCKETS)
+        metrics.observe("llm.completion_tokens", result.completion_tokens, TOKEN_BUCKETS)
+        metrics.observe("llm.cached_tokens", result.cached_tokens, TOKEN_BUCKETS)
+        if queue_wait is not None:
+            metrics.observe("llm.queue_wait_seconds", queue_wait)
+            record_timing("llm-queue", queue_wait, "max")
+        if result.first_token_seconds is not None:
+            metrics.observe("llm.ttft_seconds", result.first_token_seconds)
+            record_timing("llm-ttft", result.first_token_seconds, "max")
+        if duration is not None:
+            metrics.observe("llm.duration_seconds", duration)
+            generating = duration - (result.first_token_seconds or 0.0)
+            if result.completion_tokens and generating > 0:
+                metrics.observe("llm.output_tokens_per_second", result.completion_tokens / generating, RATE_BUCKETS)
+            record_timing(
+                "llm",
+                duration,
+                "max",
+                f"{model}, {result.prompt_tokens} prompt ({result.cached_tokens} cached) + {result.completion_tokens} completion tokens",
+            )
 
-        return completion.choices[0].message.content.strip()
+        metrics.increment(f"prompt_cache.{model}.prompt_tokens", result.prompt_tokens)
+        metrics.increment(f"prompt_cache.{model}.cached_tokens", result.cached_tokens)
+        if result.cached_tokens:
+            metrics.increment(f"prompt_cache.{model}.hits")
+            metrics.increment("prompt_cache.saved_usd", get_model_profile(model).cache_savings(result.cached_tokens))
 
+    def _next_model(self, models: List[str], index: int) -> int:
+        if index + 1 < len(models):
+            metrics.increment(f"router.fallback.{models[index + 1]}")
+            return index + 1
+        return index
 
+    async def get_openai_response(
+        self, messages: List[Dict[str, str]], models: List[str], timeout: float
+    ) -> LLMResult:
+        async with self._completion(models, messages, timeout) as (_, result):
+            return result
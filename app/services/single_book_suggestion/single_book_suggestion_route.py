@@ -1,16 +1,47 @@
-from io import BytesIO
-from typing import Optional
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
+import orjson
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile, status
+from fastapi.responses import StreamingResponse
 
+from app.core.cache import TieredCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.process_pool import BoundedProcessPool, PoolFullError, TaskTimeoutError, WorkerCrashedError
+from app.core.single_flight import SingleFlight
+from app.core.telemetry import record_timing
+from app.core.uploads import SpooledUpload, UploadTooLargeError, spool_upload
+from .document_extractor import DocumentExtractor
+from .extraction_cache import extraction_cache_key
+from .json_repair import QuizJSONError
+from .prompt_builder import PromptTooLargeError
 from .single_book_suggestion import AISuggestion
 from .single_book_suggestion_schema import (
+    single_book_estimate_response,
     single_book_suggestion_request,
     single_book_suggestion_response,
 )
+from .text_extraction import (
+    ExtractionError,
+    ExtractorUnavailableError,
+    extract_docx_text,
+    extract_pdf_pages,
+    extract_pdf_text,
+    join_pdf_pages,
+    pdf_page_count,
+    split_page_ranges,
+)
 
 router = APIRouter()
-suggestion = AISuggestion()
+# Identical concurrent /single_book requests share one get_suggestion call.
+coalescer = SingleFlight("single_flight")
+
+DISCONNECT_POLL_SECONDS = 1.0
+# Non-standard "client closed request" status; nobody is left to read the response.
+CLIENT_CLOSED_REQUEST = 499
 
 SUPPORTED_PLAIN_TYPES = {"text/plain", "application/json"}
 SUPPORTED_PDF_TYPES = {"application/pdf"}
@@ -20,87 +51,151 @@ SUPPORTED_DOC_TYPES = {
 SUPPORTED_DOC_EXTENSIONS = {".docx"}
 
 
-def _extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
+async def _run_extractor(kind: str, extraction: Awaitable[str]) -> str:
+    """Await a pool extraction and map extraction failures to HTTP errors."""
     try:
-        from pypdf import PdfReader
-    except ImportError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="PDF support is not available on the server.",
-        ) from exc
-
-    try:
-        pdf_reader = PdfReader(BytesIO(pdf_bytes))
-        text = "\n".join(filter(None, (page.extract_text() for page in pdf_reader.pages)))
-        if not text.strip():
-            raise ValueError("PDF contains no extractable text.")
-        return text
-    except Exception as exc:
+        return await extraction
+    except ExtractorUnavailableError as exc:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc)) from exc
+    except ExtractionError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Unable to extract text from PDF: {exc}",
+            detail=f"Unable to extract text from {kind}: {exc}",
         ) from exc
-
-
-def _extract_text_from_docx_bytes(docx_bytes: bytes) -> str:
-    try:
-        from docx import Document
-    except ImportError as exc:
+    except PoolFullError as exc:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="DOCX support is not available on the server.",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many documents are being extracted; retry shortly.",
+            headers={"Retry-After": "5"},
         ) from exc
-
-    try:
-        document = Document(BytesIO(docx_bytes))
-        paragraphs = [para.text.strip() for para in document.paragraphs if para.text.strip()]
-        text = "\n".join(paragraphs)
-        if not text.strip():
-            raise ValueError("DOCX contains no extractable text.")
-        return text
-    except Exception as exc:
+    except (TaskTimeoutError, MemoryError, WorkerCrashedError) as exc:
+        # Stopped by a sandbox limit (wall clock, CPU time, memory) or killed with its worker.
+        metrics.increment(f"extraction.{kind.lower()}.killed")
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Unable to extract text from DOCX: {exc}",
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"{kind} is too large or complex to extract text from.",
         ) from exc
 
 
-async def _extract_text_from_upload(upload: UploadFile) -> str:
-    """Read the uploaded file and return its textual content."""
+async def _extract_pdf(pool: BoundedProcessPool, path: str, engine: str) -> str:
+    """Extract small PDFs in one task and large ones as page ranges spread over several workers.
 
-    content = await upload.read()
-    await upload.close()
+    One PDF never takes every worker, and the first range that fails cancels the ones still queued;
+    ranges already running keep their worker until they finish.
+    """
+    range_count = min(settings.PDF_PARALLEL_MAX_RANGES, pool.workers - 1)
+    if range_count > 1 and os.path.getsize(path) >= settings.PDF_PARALLEL_MIN_BYTES:
+        page_count = await pool.run(pdf_page_count, path, engine)
+        if page_count >= settings.PDF_PARALLEL_MIN_PAGES:
+            tasks = [
+                asyncio.ensure_future(pool.run(extract_pdf_pages, path, start, stop, engine))
+                for start, stop in split_page_ranges(page_count, range_count)
+            ]
+            try:
+                parts = await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            metrics.increment("extraction.pdf.parallel")
+            return join_pdf_pages([page for part in parts for page in part])
+    return await pool.run(extract_pdf_text, path, engine)
 
-    if not content:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Uploaded file is empty.",
+
+async def _extract_text_from_pdf(extractor: DocumentExtractor, path: str) -> str:
+    return await _run_extractor("PDF", _extract_pdf(extractor.pool, path, extractor.pdf_engine))
+
+
+async def _extract_text_from_docx(extractor: DocumentExtractor, path: str) -> str:
+    return await _run_extractor("DOCX", extractor.pool.run(extract_docx_text, path))
+
+
+def _record_extraction(kind: str, started: float, engine: Optional[str] = None) -> None:
+    seconds = time.perf_counter() - started
+    metrics.observe(f"extraction.{kind}.seconds", seconds)
+    if engine is not None:
+        metrics.observe(f"extraction.{kind}.{engine}.seconds", seconds)
+    record_timing("extract", seconds, description=kind if engine is None else f"{kind}, {engine}")
+
+
+async def _extract_cached(
+    cache: TieredCache,
+    kind: str,
+    spooled: SpooledUpload,
+    extract: Callable[[], Awaitable[str]],
+    started: float,
+    engine: Optional[str] = None,
+) -> str:
+    """Serve a document's text from the cache by content hash; extract and store it on a miss."""
+    key = extraction_cache_key(kind, spooled.sha256, engine)
+    text = await asyncio.to_thread(cache.get, key)
+    if text is not None:
+        label = kind if engine is None else f"{kind}, {engine}"
+        record_timing("extract", time.perf_counter() - started, description=f"{label}, cached")
+        return text
+    extraction_started = time.perf_counter()
+    text = await extract()
+    _record_extraction(kind, started, engine)
+    await asyncio.to_thread(cache.put, key, text, time.perf_counter() - extraction_started)
+    return text
+
+
+async def _spool(upload: UploadFile) -> SpooledUpload:
+    try:
+        return await spool_upload(
+            upload, settings.UPLOAD_MAX_BYTES, settings.UPLOAD_CHUNK_BYTES, settings.UPLOAD_SPOOL_DIR
         )
+    except UploadTooLargeError as exc:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(exc)) from exc
+    finally:
+        await upload.close()
+
 
-    content_type = (upload.content_type or "").lower()
+async def _extract_text_from_upload(upload: UploadFile, extractor: DocumentExtractor) -> str:
+    """Spool the uploaded file to disk and return its textual content."""
 
-    if content_type in SUPPORTED_PLAIN_TYPES:
-        try:
-            return content.decode("utf-8")
-        except UnicodeDecodeError as exc:
+    started = time.perf_counter()
+    with await _spool(upload) as spooled:
+        if not spooled.size:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Unable to decode text file as UTF-8.",
-            ) from exc
+                detail="Uploaded file is empty.",
+            )
+
+        content_type = (upload.content_type or "").lower()
+
+        if content_type in SUPPORTED_PLAIN_TYPES:
+            try:
+                text = await asyncio.to_thread(spooled.read_text)
+                _record_extraction("text", started)
+                return text
+            except UnicodeDecodeError as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Unable to decode text file as UTF-8.",
+                ) from exc
 
-    filename = upload.filename or ""
-    lower_filename = filename.lower()
+        filename = upload.filename or ""
+        lower_filename = filename.lower()
 
-    if (
-        content_type in SUPPORTED_DOC_TYPES
-        or (not content_type and any(lower_filename.endswith(ext) for ext in SUPPORTED_DOC_EXTENSIONS))
-    ):
-        return _extract_text_from_docx_bytes(content)
+        if (
+            content_type in SUPPORTED_DOC_TYPES
+            or (not content_type and any(lower_filename.endswith(ext) for ext in SUPPORTED_DOC_EXTENSIONS))
+        ):
+            return await _extract_cached(
+                extractor.cache, "docx", spooled, lambda: _extract_text_from_docx(extractor, spooled.path), started
+            )
 
-    if content_type in SUPPORTED_PDF_TYPES or (
-        not content_type and lower_filename.endswith(".pdf")
-    ):
-        return _extract_text_from_pdf_bytes(content)
+        if content_type in SUPPORTED_PDF_TYPES or (
+            not content_type and lower_filename.endswith(".pdf")
+        ):
+            return await _extract_cached(
+                extractor.cache,
+                "pdf",
+                spooled,
+                lambda: _extract_text_from_pdf(extractor, spooled.path),
+                started,
+                extractor.pdf_engine,
+            )
 
     raise HTTPException(
         status_code=status.HTTP_400_BAD_REQUEST,
@@ -108,33 +203,144 @@ async def _extract_text_from_upload(upload: UploadFile) -> str:
     )
 
 
+async def _build_request_data(
+    bookId: int,
+    bookName: str,
+    extracted_quiz: Optional[str],
+    quiz_file: Optional[UploadFile],
+    extractor: DocumentExtractor,
+) -> single_book_suggestion_request:
+    if quiz_file is not None:
+        extracted_quiz = await _extract_text_from_upload(quiz_file, extractor)
+
+    if not extracted_quiz or not extracted_quiz.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Please provide quiz content either as text or as a supported file.",
+        )
+
+    return single_book_suggestion_request(
+        extracted_quiz=extracted_quiz,
+        bookId=bookId,
+        bookName=bookName,
+    )
+
+
+def get_ai_suggestion(request: Request) -> AISuggestion:
+    """The AISuggestion (and its LLM connection pool) created by the application lifespan."""
+    return request.app.state.ai_suggestion
+
+
+def get_document_extractor(request: Request) -> DocumentExtractor:
+    """The extraction pool, text cache and PDF engine, set up by the application lifespan."""
+    return request.app.state.document_extractor
+
+
+async def _cancel_on_disconnect(request: Request, awaitable: Awaitable[Any]) -> Any:
+    """Await ``awaitable``, cancelling it if the client disconnects first."""
+    task = asyncio.ensure_future(awaitable)
+
+    async def watch_disconnect():
+        while not task.done():
+            if await request.is_disconnected():
+                task.cancel()
+                return
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if watcher.done() and not watcher.cancelled():
+            raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected.")
+        raise
+    finally:
+        watcher.cancel()
+
+
 @router.post("/single_book", response_model=single_book_suggestion_response)
 async def get_suggestion(
+    request: Request,
     bookId: int = Form(...),
     bookName: str = Form(...),
     extracted_quiz: Optional[str] = Form(None),
     quiz_file: Optional[UploadFile] = File(None),
+    suggestion: AISuggestion = Depends(get_ai_suggestion),
+    extractor: DocumentExtractor = Depends(get_document_extractor),
 ):
     try:
-        if quiz_file is not None:
-            extracted_quiz = await _extract_text_from_upload(quiz_file)
+        request_data = await _build_request_data(bookId, bookName, extracted_quiz, quiz_file, extractor)
+        response = await _cancel_on_disconnect(
+            request,
+            coalescer.run(
+                suggestion.request_key(request_data),
+                lambda: suggestion.get_suggestion(request_data),
+            ),
+        )
+        return response
 
-        if not extracted_quiz or not extracted_quiz.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Please provide quiz content either as text or as a supported file.",
-            )
+    except HTTPException:
+        raise
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(e))
+    except QuizJSONError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        request_data = single_book_suggestion_request(
-            extracted_quiz=extracted_quiz,
-            bookId=bookId,
-            bookName=bookName,
-        )
 
-        response = await suggestion.get_suggestion(request_data)
-        return response
+@router.post("/estimate", response_model=single_book_estimate_response)
+async def estimate(
+    bookId: int = Form(...),
+    bookName: str = Form(...),
+    extracted_quiz: Optional[str] = Form(None),
+    quiz_file: Optional[UploadFile] = File(None),
+    suggestion: AISuggestion = Depends(get_ai_suggestion),
+    extractor: DocumentExtractor = Depends(get_document_extractor),
+):
+    """Plan a /single_book request without calling the model: mode, tokens, latency and cost."""
+    try:
+        request_data = await _build_request_data(bookId, bookName, extracted_quiz, quiz_file, extractor)
+        return single_book_estimate_response(**suggestion.plan(request_data).to_dict())
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _ndjson_line(event: Dict[str, Any]) -> bytes:
+    return orjson.dumps(event, option=orjson.OPT_APPEND_NEWLINE)
+
+
+async def _ndjson_events(
+    suggestion: AISuggestion, request_data: single_book_suggestion_request
+) -> AsyncIterator[bytes]:
+    yield _ndjson_line({"type": "book", "bookId": request_data.bookId, "bookName": request_data.bookName})
+    count = 0
+    try:
+        async for question in suggestion.stream_suggestion(request_data):
+            count += 1
+            yield _ndjson_line({"type": "question", "question": question.model_dump()})
+    except Exception as e:
+        yield _ndjson_line({"type": "error", "detail": str(e)})
+        return
+    yield _ndjson_line({"type": "done", "count": count})
+
+
+@router.post("/single_book/stream")
+async def stream_suggestion(
+    bookId: int = Form(...),
+    bookName: str = Form(...),
+    extracted_quiz: Optional[str] = Form(None),
+    quiz_file: Optional[UploadFile] = File(None),
+    suggestion: AISuggestion = Depends(get_ai_suggestion),
+    extractor: DocumentExtractor = Depends(get_document_extractor),
+):
+    """Stream formatted questions as NDJSON events while the model generates them.
+
+    Events are ``book`` (once), ``question`` (per finished question), then
+    ``done`` or ``error``.
+    """
+    request_data = await _build_request_data(bookId, bookName, extracted_quiz, quiz_file, extractor)
+    return StreamingResponse(_ndjson_events(suggestion, request_data), media_type="application/x-ndjson")
@@ -1,6 +1,26 @@
-from pydantic import BaseModel
-from typing import List, Union, Dict,Any  
+from pydantic import BaseModel, BeforeValidator, ConfigDict
+from typing import Annotated, List, Optional, Union, Dict,Any  
 
+
+def _option_text(value: Any) -> Any:
+    # Models sometimes write numeric options such as [1, 2, 3, 4]; they are still answer texts.
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+option_text = Annotated[str, BeforeValidator(_option_text)]
+
+class quiz_question(BaseModel):
+    model_config = ConfigDict(strict=True, extra="ignore")
+
+    questionNo: int
+    content: str
+    options: List[option_text]
+    correctAnswers: List[option_text]
+class quiz_output(BaseModel):
+    """The JSON object the model is asked to produce."""
+    questions: List[quiz_question]
 class single_book_suggestion_request (BaseModel):
     extracted_quiz:str
     bookId: int
@@ -8,4 +28,15 @@ class single_book_suggestion_request (BaseModel):
 class single_book_suggestion_response(BaseModel):
     bookId: int
     bookName: str
-    questions: List[Dict[str, Any]] 
\ No newline at end of file
+    questions: List[quiz_question]
+class single_book_estimate_response(BaseModel):
+    mode: str
+    model: str
+    fallback_model: Optional[str] = None
+    question_count: int
+    chunk_count: int
+    prompt_tokens: int
+    estimated_output_tokens: int
+    estimated_seconds: float
+    estimated_cost_usd: float
+    reason: str
@@ -0,0 +1,150 @@
+import zipfile
+from typing import Iterator, List, Tuple
+from xml.etree import ElementTree
+
+from .pdf_engines import DEFAULT_PDF_ENGINE, get_pdf_engine
+
+# Extractors run in worker processes and read the spooled upload from its path,
+# so this module stays importable without the web app.
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = f"{W}body"
+W_PARAGRAPH = f"{W}p"
+W_TABLE = f"{W}tbl"
+W_RUN = f"{W}r"
+W_TEXT = f"{W}t"
+# Run children that python-docx renders as characters (w:tab outside runs is a tab stop).
+W_RUN_CHARACTERS = {f"{W}tab": "\t", f"{W}ptab": "\t", f"{W}br": "\n", f"{W}cr": "\n", f"{W}noBreakHyphen": "-"}
+
+
+# Raised in workers when the pool's time, CPU or memory limit interrupts an extraction;
+# they have to reach the pool as they are, not as an unreadable document.
+LIMIT_ERRORS = (MemoryError, TimeoutError)
+
+
+class ExtractionError(ValueError):
+    """The document could not be read or holds no text."""
+
+
+class ExtractorUnavailableError(RuntimeError):
+    """The library needed for a document type is not installed."""
+
+
+def _open_pdf(path: str, engine: str):
+    try:
+        pdf_engine = get_pdf_engine(engine)
+    except ImportError as exc:
+        raise ExtractorUnavailableError("PDF support is not available on the server.") from exc
+    try:
+        return pdf_engine, pdf_engine.open(path)
+    except LIMIT_ERRORS:
+        raise
+    except Exception as exc:
+        raise ExtractionError(str(exc)) from exc
+
+
+def pdf_page_count(path: str, engine: str = DEFAULT_PDF_ENGINE) -> int:
+    pdf_engine, document = _open_pdf(path, engine)
+    try:
+        return pdf_engine.page_count(document)
+    except LIMIT_ERRORS:
+        raise
+    except Exception as exc:
+        raise ExtractionError(str(exc)) from exc
+    finally:
+        pdf_engine.close(document)
+
+
+def extract_pdf_pages(path: str, start: int, stop: int, engine: str = DEFAULT_PDF_ENGINE) -> List[str]:
+    """Text of pages ``start`` to ``stop - 1``; lets workers extract ranges of one PDF in parallel."""
+    pdf_engine, document = _open_pdf(path, engine)
+    try:
+        return [pdf_engine.page_text(document, index) for index in range(start, stop)]
+    except LIMIT_ERRORS:
+        raise
+    except Exception as exc:
+        raise ExtractionError(str(exc)) from exc
+    finally:
+        pdf_engine.close(document)
+
+
+def join_pdf_pages(pages: List[str]) -> str:
+    text = "\n".join(filter(None, pages))
+    if not text.strip():
+        raise ExtractionError("PDF contains no extractable text.")
+    return text
+
+
+def extract_pdf_text(path: str, engine: str = DEFAULT_PDF_ENGINE) -> str:
+    pdf_engine, document = _open_pdf(path, engine)
+    try:
+        pages = [pdf_engine.page_text(document, index) for index in range(pdf_engine.page_count(document))]
+    except LIMIT_ERRORS:
+        raise
+    except Exception as exc:
+        raise ExtractionError(str(exc)) from exc
+    finally:
+        pdf_engine.close(document)
+    return join_pdf_pages(pages)
+
+
+def split_page_ranges(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    """Split ``range(page_count)`` into at most ``parts`` contiguous, near-equal ranges."""
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for index in range(parts):
+        stop = start + size + (1 if index < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def iter_docx_paragraphs(path: str) -> Iterator[str]:
+    """Yield the text of each paragraph of a DOCX, table cells included, in document order.
+
+    Reads word/document.xml straight from the zip with incremental parsing,
+    so memory stays flat however long the document is. Run text follows
+    python-docx: tabs and breaks inside runs become "\t" and "\n"; deleted
+    text and field codes are skipped.
+    """
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as document:
+        parts: List[List[str]] = []
+        in_run = 0
+        body = None
+        for event, element in ElementTree.iterparse(document, events=("start", "end")):
+            tag = element.tag
+            if event == "start":
+                if tag == W_PARAGRAPH:
+                    parts.append([])
+                elif tag == W_RUN:
+                    in_run += 1
+                elif tag == W_BODY:
+                    body = element
+                continue
+            if tag == W_TEXT and parts:
+                parts[-1].append(element.text or "")
+            elif tag in W_RUN_CHARACTERS and in_run and parts:
+                parts[-1].append(W_RUN_CHARACTERS[tag])
+            elif tag == W_RUN:
+                in_run -= 1
+            elif tag == W_PARAGRAPH:
+                yield "".join(parts.pop())
+            if body is not None and not parts and tag in (W_PARAGRAPH, W_TABLE):
+                # A top-level paragraph or table is done: drop everything parsed so far.
+                body.clear()
+
+
+def extract_docx_text(path: str) -> str:
+    try:
+        paragraphs = [text.strip() for text in iter_docx_paragraphs(path) if text.strip()]
+    except LIMIT_ERRORS:
+        raise
+    except Exception as exc:
+        # Bad zips, missing parts, malformed XML, corrupt deflate data, encrypted members...
+        raise ExtractionError(str(exc)) from exc
+    text = "\n".join(paragraphs)
+    if not text.strip():
+        raise ExtractionError("DOCX contains no extractable text.")
+    return text
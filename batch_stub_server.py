@@ -0,0 +1,169 @@
+"""Local stand-in for the OpenAI Files and Batch APIs.
+
+Lets the --batch mode of single_book.py and multiple_book.py run offline:
+
+    python batch_stub_server.py
+    OPENAI_BASE_URL=http://localhost:9094/v1 python single_book.py --batch
+
+Each chat completion in a batch is "answered" by the rule-based quiz parser,
+so the output has the same shape as a real model's formatted quiz.
+LLM_BACKEND=stub skips HTTP altogether; this server exercises the real
+upload/submit/poll path of the OpenAI backend.
+"""
+import asyncio
+import json
+import os
+import time
+from uuid import uuid4
+
+import uvicorn
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from app.services.single_book_suggestion.local_quiz_parser import parse_quiz
+
+app = FastAPI(title="OpenAI Batch API stub")
+
+# Seconds each batch spends "in_progress" before it completes.
+PROCESSING_DELAY = float(os.getenv("BATCH_STUB_DELAY", "2"))
+
+files = {}
+batches = {}
+
+
+class batch_create_request(BaseModel):
+    input_file_id: str
+    endpoint: str
+    completion_window: str
+    metadata: dict = None
+
+
+def _file_object(file_id: str) -> dict:
+    stored = files[file_id]
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(stored["content"]),
+        "created_at": stored["created_at"],
+        "filename": stored["filename"],
+        "purpose": stored["purpose"],
+        "status": "processed",
+    }
+
+
+def _complete(body: dict) -> dict:
+    """Deterministic chat completion: format the quiz in the last message locally."""
+    quiz_text = body["messages"][-1]["content"]
+    content = json.dumps({"questions": parse_quiz(quiz_text).questions}, ensure_ascii=False)
+    prompt_tokens = sum(len(message["content"]) for message in body["messages"]) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-{uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+async def _process_batch(batch_id: str) -> None:
+    batch = batches[batch_id]
+    batch["status"] = "in_progress"
+    batch["in_progress_at"] = int(time.time())
+    await asyncio.sleep(PROCESSING_DELAY)
+
+    lines = files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+    output, errors = [], []
+    for line in filter(str.strip, lines):
+        request = json.loads(line)
+        try:
+            output.append({
+                "id": f"batch_req_{uuid4().hex}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid4().hex, "body": _complete(request["body"])},
+                "error": None,
+            })
+        except Exception as exc:
+            errors.append({
+                "id": f"batch_req_{uuid4().hex}",
+                "custom_id": request.get("custom_id"),
+                "response": None,
+                "error": {"code": "stub_error", "message": str(exc)},
+            })
+
+    for key, records in (("output_file_id", output), ("error_file_id", errors)):
+        if records:
+            file_id = f"file-{uuid4().hex}"
+            files[file_id] = {
+                "content": "".join(json.dumps(record) + "\n" for record in records).encode("utf-8"),
+                "filename": f"{batch_id}_{key}.jsonl",
+                "purpose": "batch_output",
+                "created_at": int(time.time()),
+            }
+            batch[key] = file_id
+
+    batch["request_counts"] = {"total": len(output) + len(errors), "completed": len(output), "failed": len(errors)}
+    batch["status"] = "completed"
+    batch["completed_at"] = int(time.time())
+
+
+@app.post("/v1/files")
+async def create_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    file_id = f"file-{uuid4().hex}"
+    files[file_id] = {
+        "content": await file.read(),
+        "filename": file.filename,
+        "purpose": purpose,
+        "created_at": int(time.time()),
+    }
+    return _file_object(file_id)
+
+
+@app.get("/v1/files/{file_id}/content")
+async def get_file_content(file_id: str):
+    if file_id not in files:
+        raise HTTPException(status_code=404, detail="No such file.")
+    return Response(files[file_id]["content"], media_type="application/octet-stream")
+
+
+@app.post("/v1/batches")
+async def create_batch(request: batch_create_request):
+    if request.input_file_id not in files:
+        raise HTTPException(status_code=404, detail="No such input file.")
+    batch_id = f"batch_{uuid4().hex}"
+    batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": request.endpoint,
+        "input_file_id": request.input_file_id,
+        "completion_window": request.completion_window,
+        "status": "validating",
+        "created_at": int(time.time()),
+        "output_file_id": None,
+        "error_file_id": None,
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        "metadata": request.metadata,
+    }
+    asyncio.create_task(_process_batch(batch_id))
+    return batches[batch_id]
+
+
+@app.get("/v1/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    if batch_id not in batches:
+        raise HTTPException(status_code=404, detail="No such batch.")
+    return batches[batch_id]
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("BATCH_STUB_PORT", "9094")))
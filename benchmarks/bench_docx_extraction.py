@@ -0,0 +1,92 @@
+"""Streaming DOCX extraction vs python-docx on large quiz documents.
+
+Each measurement runs in a fresh process. Peak memory is the growth of the
+process's RSS high-water mark over the extraction; the mark is reset first
+through /proc/self/clear_refs, so this benchmark needs Linux.
+
+    PYTHONPATH=. python benchmarks/bench_docx_extraction.py --questions 1000 10000 50000
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from typing import Tuple
+
+from benchmarks.synthetic_documents import build_quiz_docx
+
+
+def python_docx_text(path: str) -> str:
+    from docx import Document
+
+    document = Document(path)
+    return "\n".join(para.text.strip() for para in document.paragraphs if para.text.strip())
+
+
+def streaming_text(path: str) -> str:
+    from app.services.single_book_suggestion.text_extraction import extract_docx_text
+
+    return extract_docx_text(path)
+
+
+EXTRACTORS = {"python-docx": python_docx_text, "streaming": streaming_text}
+
+
+def _memory_kib(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not found in /proc/self/status")
+
+
+def measure(name: str, path: str) -> Tuple[float, float, int]:
+    """Seconds, peak RSS growth in MiB and text length of one extraction."""
+    import docx  # noqa: F401  Import cost is not part of the measurement.
+    import app.services.single_book_suggestion.text_extraction  # noqa: F401
+
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")  # Reset the RSS high-water mark to the current RSS.
+    baseline = _memory_kib("VmRSS")
+    started = time.perf_counter()
+    text = EXTRACTORS[name](path)
+    seconds = time.perf_counter() - started
+    return seconds, (_memory_kib("VmHWM") - baseline) / 1024, len(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"median of {args.repeat} runs, each in a fresh process\n")
+    print(f"{'questions':>9} {'size':>8} {'python-docx':>20} {'streaming':>20} {'speedup':>8}")
+    for question_count in args.questions:
+        with tempfile.NamedTemporaryFile(suffix=".docx", delete=False) as file:
+            path = file.name
+        try:
+            build_quiz_docx(path, question_count)
+            results = {}
+            for name in EXTRACTORS:
+                runs = []
+                for _ in range(args.repeat):
+                    with context.Pool(1) as pool:
+                        runs.append(pool.apply(measure, (name, path)))
+                results[name] = (
+                    statistics.median(run[0] for run in runs),
+                    statistics.median(run[1] for run in runs),
+                    runs[0][2],
+                )
+            assert results["python-docx"][2] == results["streaming"][2], "extractors disagree on the text"
+            cells = [f"{seconds * 1000:>8.0f}ms {memory:>6.1f}MiB" for seconds, memory, _ in results.values()]
+            speedup = results["python-docx"][0] / results["streaming"][0]
+            print(f"{question_count:>9} {os.path.getsize(path) / 1024:>6.0f}KB {cells[0]:>20} {cells[1]:>20} {speedup:>7.1f}x")
+        finally:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Completion latency with and without hedging on the stub backend.
+
+Every call goes through AISuggestion.get_openai_response (limiter, quota,
+hedger) against a StubBackend with a heavy-tailed log-normal time to first
+token, once with HEDGING_ENABLED off and once on. The stub is reseeded for
+each run, so both see the same latency draws in the same order.
+
+    PYTHONPATH=. python benchmarks/bench_hedging.py --calls 300 --median 0.1 --sigma 1.2 --budget 60
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.single_book_suggestion.single_book_suggestion import AISuggestion
+from app.services.single_book_suggestion.single_book_suggestion_schema import single_book_suggestion_request
+
+QUIZ = "1. Who wrote the letter?\nA. Anna\nB. Ben\nC. Carl\nD. Dora\nAnswer: B\n"
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(args: argparse.Namespace, hedging: bool) -> None:
+    settings.HEDGING_ENABLED = hedging
+    suggestion = AISuggestion()
+    messages = suggestion.build_messages(
+        single_book_suggestion_request(extracted_quiz=QUIZ, bookId=1, bookName="Benchmark")
+    ).messages
+    fired_before = metrics.snapshot()["counters"].get("hedge.fired", 0)
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def call() -> float:
+        async with gate:
+            started = time.perf_counter()
+            await suggestion.get_openai_response(messages, [suggestion.model], settings.LLM_TIMEOUT_SECONDS)
+            return time.perf_counter() - started
+
+    samples = await asyncio.gather(*(call() for _ in range(args.calls)))
+    fired = metrics.snapshot()["counters"].get("hedge.fired", 0) - fired_before
+    print(
+        f"{'hedging' if hedging else 'no hedging':<12} p50 {statistics.median(samples):6.2f} s   "
+        f"p99 {percentile(samples, 0.99):6.2f} s   max {max(samples):6.2f} s   hedges {fired:g}"
+    )
+    await suggestion.backend.aclose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--median", type=float, default=0.1, help="stub median time to first token, seconds")
+    parser.add_argument("--sigma", type=float, default=1.2, help="stub log-normal sigma")
+    parser.add_argument("--budget", type=int, default=60, help="HEDGE_BUDGET_PER_MINUTE")
+    args = parser.parse_args()
+
+    settings.LLM_BACKEND = "stub"
+    settings.OPENAI_RPM = 0
+    settings.STUB_LATENCY_MEDIAN_SECONDS = args.median
+    settings.STUB_LATENCY_SIGMA = args.sigma
+    settings.HEDGE_BUDGET_PER_MINUTE = args.budget
+    settings.RATE_LIMIT_DB = str(Path(tempfile.mkdtemp()) / "rate_limit.sqlite3")
+    print(
+        f"{args.calls} calls, {args.concurrency} concurrent, time to first token median {args.median}s "
+        f"sigma {args.sigma}, hedge budget {args.budget}/min\n"
+    )
+    for hedging in (False, True):
+        await run(args, hedging)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""Single-process vs page-parallel PDF text extraction across page counts.
+
+The parallel run splits the pages over the workers of a BoundedProcessPool
+(page count first, then one page range per worker). /single_book does the
+same for large uploads but leaves one worker free and uses at most
+PDF_PARALLEL_MAX_RANGES ranges. Workers are started before timing.
+
+    PYTHONPATH=. python benchmarks/bench_pdf_extraction.py --pages 10 50 200 800 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from app.core.process_pool import BoundedProcessPool
+from app.services.single_book_suggestion.text_extraction import (
+    extract_pdf_pages,
+    extract_pdf_text,
+    join_pdf_pages,
+    pdf_page_count,
+    split_page_ranges,
+)
+from benchmarks.synthetic_documents import build_quiz_pdf
+
+
+async def extract_parallel(pool: BoundedProcessPool, path: str) -> str:
+    page_count = await pool.run(pdf_page_count, path)
+    ranges = split_page_ranges(page_count, pool.workers)
+    parts = await asyncio.gather(*(pool.run(extract_pdf_pages, path, start, stop) for start, stop in ranges))
+    return join_pdf_pages([page for part in parts for page in part])
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200, 800])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pool = BoundedProcessPool("bench_pool", args.workers, max_queue=1024, timeout=600, preload=("pypdf",))
+    await pool.warm_up()
+    print(f"{args.workers} workers, {os.cpu_count()} CPUs, median of {args.repeat} runs\n")
+    print(f"{'pages':>6} {'size':>9} {'single':>10} {'pool, 1 task':>13} {'parallel':>10} {'speedup':>8}")
+    try:
+        for page_count in args.pages:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as file:
+                file.write(build_quiz_pdf(page_count))
+            try:
+                timings = {"single": [], "pool": [], "parallel": []}
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    expected = extract_pdf_text(file.name)
+                    timings["single"].append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    await pool.run(extract_pdf_text, file.name)
+                    timings["pool"].append(time.perf_counter() - started)
+
+                    started = time.perf_counter()
+                    text = await extract_parallel(pool, file.name)
+                    timings["parallel"].append(time.perf_counter() - started)
+                    assert text == expected, "parallel extraction changed the text"
+                single, pooled, parallel = (statistics.median(timings[key]) for key in ("single", "pool", "parallel"))
+                size = os.path.getsize(file.name) / 1024
+                print(
+                    f"{page_count:>6} {size:>7.0f}KB {single * 1000:>8.0f}ms {pooled * 1000:>11.0f}ms "
+                    f"{parallel * 1000:>8.0f}ms {pooled / parallel:>7.2f}x"
+                )
+            finally:
+                os.unlink(file.name)
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
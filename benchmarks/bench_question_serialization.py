@@ -0,0 +1,75 @@
+"""Validation and serialization time of large quizzes.
+
+Compares the per-call json.loads + model construction path with the cached
+TypeAdapter, and jsonable_encoder + json.dumps with orjson and pydantic's
+own JSON serializer (what FastAPI uses for a response_model).
+
+    PYTHONPATH=. python benchmarks/bench_question_serialization.py --questions 1000
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.services.single_book_suggestion.json_repair import QUIZ_OUTPUT_ADAPTER, repair_quiz_json
+from app.services.single_book_suggestion.single_book_suggestion_schema import (
+    quiz_output,
+    single_book_suggestion_response,
+)
+
+
+def build_quiz_json(question_count: int) -> str:
+    return json.dumps({
+        "questions": [
+            {
+                "questionNo": number,
+                "content": f"Question {number}: which of these happens in chapter {number % 40 + 1}?",
+                "options": [f"Option {letter} for question {number}" for letter in "ABCD"],
+                "correctAnswers": [f"Option {'ABCD'[number % 4]} for question {number}"],
+            }
+            for number in range(1, question_count + 1)
+        ]
+    })
+
+
+def timed(function: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def report(label: str, samples: List[float]) -> None:
+    print(f"{label:<48} median {statistics.median(samples):8.2f} ms   min {min(samples):8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    text = build_quiz_json(args.questions)
+    questions = QUIZ_OUTPUT_ADAPTER.validate_json(text).questions
+    response = single_book_suggestion_response(bookId=1, bookName="Benchmark", questions=questions)
+    print(f"{args.questions} questions, {len(text) / 1024:.0f} KiB of model output, {args.repeat} runs each\n")
+
+    print("Validation of model output")
+    report("json.loads + quiz_output(**document)", timed(lambda: quiz_output(**json.loads(text)), args.repeat))
+    report("TypeAdapter.validate_json (cached)", timed(lambda: QUIZ_OUTPUT_ADAPTER.validate_json(text), args.repeat))
+    report("repair_quiz_json", timed(lambda: repair_quiz_json(text), args.repeat))
+
+    print("\nSerialization of the response")
+    report("jsonable_encoder + json.dumps", timed(lambda: json.dumps(jsonable_encoder(response)), args.repeat))
+    report("orjson.dumps(model_dump())", timed(lambda: orjson.dumps(response.model_dump()), args.repeat))
+    report("model_dump_json (FastAPI response_model)", timed(response.model_dump_json, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Time the installed PDF engines and check their text, as PDF_ENGINE=auto does at startup.
+
+Without arguments the built-in generated sample is used (known text); with
+PDF paths, each engine's text is scored against what pypdf extracts.
+``--check`` exits non-zero unless every installed engine runs and passes the
+quality check; run it wherever the optional engines are installed.
+
+    PYTHONPATH=. python benchmarks/calibrate_pdf_engines.py [samples/*.pdf] [--repeat 5] [--check]
+"""
+import argparse
+import sys
+
+from app.core.config import settings
+from app.services.single_book_suggestion.pdf_engines import (
+    PDF_ENGINES,
+    available_pdf_engines,
+    calibrate_pdf_engines,
+    choose_pdf_engine,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("samples", nargs="*", help="PDF files to calibrate on")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-quality", type=float, default=settings.PDF_ENGINE_MIN_QUALITY)
+    parser.add_argument("--check", action="store_true", help="fail unless every installed engine passes")
+    args = parser.parse_args()
+
+    engines = available_pdf_engines()
+    missing = sorted(set(PDF_ENGINES) - set(engines))
+    print(f"installed: {', '.join(engines)}" + (f"; not installed: {', '.join(missing)}" if missing else ""))
+    print(f"samples: {', '.join(args.samples) if args.samples else 'built-in'}, best of {args.repeat} runs\n")
+
+    calibrations = calibrate_pdf_engines(engines, args.samples or None, args.repeat)
+    print(f"{'engine':<12} {'seconds':>9} {'quality':>8}  result")
+    for result in calibrations:
+        if result.error is not None:
+            print(f"{result.name:<12} {'-':>9} {'-':>8}  error: {result.error}")
+            continue
+        verdict = "pass" if result.passed(args.min_quality) else "below quality"
+        print(f"{result.name:<12} {result.seconds:>9.4f} {result.quality:>8.3f}  {verdict}")
+    print(f"\nPDF_ENGINE={choose_pdf_engine(calibrations, args.min_quality)}")
+    if args.check and not all(result.passed(args.min_quality) for result in calibrations):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Synthetic quiz documents for the extraction benchmarks."""
+import zipfile
+from typing import Iterator, List
+from xml.sax.saxutils import escape
+
+from app.services.single_book_suggestion.pdf_engines import build_text_pdf
+
+
+def quiz_lines(question_count: int) -> Iterator[str]:
+    for number in range(1, question_count + 1):
+        yield f"{number}. Which of these events happens in chapter {number % 40 + 1} of the book?"
+        for letter in "ABCD":
+            yield f"{letter}) Option {letter} describing a possible answer to question {number}"
+        yield f"Answer: {'ABCD'[number % 4]}"
+
+
+def build_quiz_pdf(page_count: int, questions_per_page: int = 10) -> bytes:
+    lines = list(quiz_lines(page_count * questions_per_page))
+    per_page = len(lines) // page_count
+    return build_text_pdf([lines[index:index + per_page] for index in range(0, per_page * page_count, per_page)])
+
+
+def build_quiz_docx(path: str, question_count: int) -> None:
+    """A quiz DOCX with one paragraph per question line.
+
+    python-docx writes the package; the body is generated directly because
+    adding tens of thousands of paragraphs through its API is very slow.
+    """
+    from docx import Document
+
+    Document().save(path)
+    paragraphs = "".join(
+        f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(line)}</w:t></w:r></w:p>" for line in quiz_lines(question_count)
+    )
+    body = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{paragraphs}<w:sectPr/></w:body></w:document>"
+    )
+    with zipfile.ZipFile(path) as template:
+        parts = {name: template.read(name) for name in template.namelist()}
+    parts["word/document.xml"] = body.encode("utf-8")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in parts.items():
+            archive.writestr(name, data)
@@ -1,26 +1,52 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.telemetry import ServerTimingMiddleware
+from app.core.uploads import RequestSizeLimitMiddleware
+from app.services.single_book_suggestion.document_extractor import DocumentExtractor
+from app.services.single_book_suggestion.single_book_suggestion import AISuggestion
 from app.services.single_book_suggestion.single_book_suggestion_route import router as single_book_suggestion_router
 from app.services.regenerate_plan.regenerate_plan_route import router as regenerate_plan_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One AISuggestion and LLM connection pool per worker, connected before the first request.
+    app.state.ai_suggestion = AISuggestion()
+    await app.state.ai_suggestion.warm_up()
+    # Uploads are parsed in separate processes so a large PDF does not block the event loop;
+    # warm-up also picks the PDF engine.
+    app.state.document_extractor = DocumentExtractor()
+    await app.state.document_extractor.warm_up()
+    yield
+    app.state.document_extractor.shutdown()
+    await app.state.ai_suggestion.aclose()
+
+
 app = FastAPI(
     title="Vuku AI",
     description="AI service for Quiz generation and management",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# Multipart framing and form fields come on top of the file itself. Added before
+# CORSMiddleware so that its early 413 still carries the CORS headers.
+app.add_middleware(RequestSizeLimitMiddleware, max_bytes=settings.UPLOAD_MAX_BYTES + 1024 * 1024)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(ServerTimingMiddleware)
 
 app.include_router(single_book_suggestion_router, tags=["Single Book"])
 app.include_router(regenerate_plan_router, tags=["Regenerate Plan"])
@@ -43,6 +69,11 @@ async def health_check():
         "service": "Vuku AI"
     }
 
+@app.get("/metrics", tags=["Health"])
+async def get_metrics():
+    """Process-local counters, gauges and histograms (cache hits, savings, LLM latency, ...)"""
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app", 
@@ -1,15 +1,17 @@
 import os
+import argparse
 import asyncio
 import aiohttp
 import json
 import re
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
-from docx import Document
 from dotenv import load_dotenv
 import urllib.parse
 import logging
+from app.services.single_book_suggestion.extraction_cache import create_extraction_cache, extract_cached
 from app.services.single_book_suggestion.single_book_suggestion import AISuggestion
+from app.services.single_book_suggestion.text_extraction import extract_docx_text
 from app.services.single_book_suggestion.single_book_suggestion_schema import (
     single_book_suggestion_request,
     single_book_suggestion_response
@@ -35,6 +37,8 @@ class MultipleBookProcessor:
         self.api_base_url = os.getenv("API_BASE_URL", "https://ashlynprasad-backend.vercel.app/api/v1")
         self.multiple_books_file = Path("Multiple books.docx")
         self.ai_suggestion = AISuggestion()
+        # Same cache directory as the API, so files already uploaded there are not parsed again.
+        self.extraction_cache = create_extraction_cache()
         
         if not self.auth_token:
             raise ValueError("AUTH_TOKEN not found in environment variables")
@@ -42,9 +46,7 @@ class MultipleBookProcessor:
     def extract_text_from_docx(self, file_path: Path) -> str:
         """Extract text content from a DOCX file."""
         try:
-            document = Document(file_path)
-            paragraphs = [para.text.strip() for para in document.paragraphs if para.text.strip()]
-            return "\n".join(paragraphs)
+            return extract_cached(self.extraction_cache, "docx", file_path, extract_docx_text)
         except Exception as e:
             logger.error(f"Error extracting text from {file_path}: {e}")
             return ""
@@ -165,54 +167,110 @@ class MultipleBookProcessor:
             logger.error(f"Error creating quiz for book {quiz_data.get('bookName')}: {e}")
             return False
     
+    async def prepare_request(
+        self, session: aiohttp.ClientSession, book_data: BookData
+    ) -> Optional[single_book_suggestion_request]:
+        """Look up a parsed book and build its suggestion request."""
+        # Get book information from API
+        book_info = await self.get_book_by_title(session, book_data.title)
+        if not book_info:
+            logger.warning(f"Could not find book info for: {book_data.title}")
+            return None
+        
+        book_id = book_info.get('nid')
+        book_name = book_info.get('title', book_data.title)
+        
+        logger.info(f"Found book: {book_name} (ID: {book_id})")
+        
+        # Create request for AI suggestion
+        return single_book_suggestion_request(
+            extracted_quiz=book_data.quiz_content,
+            bookId=book_id,
+            bookName=book_name
+        )
+    
+    async def publish_quiz(self, session: aiohttp.ClientSession, ai_response: single_book_suggestion_response) -> bool:
+        """Create the formatted quiz via the API."""
+        # Convert to dictionary for API
+        quiz_data = {
+            "bookId": ai_response.bookId,
+            "bookName": ai_response.bookName,
+            "questions": [question.model_dump() for question in ai_response.questions]
+        }
+        
+        # Create quiz via API
+        success = await self.create_quiz(session, quiz_data)
+        if success:
+            logger.info(f"Successfully processed book: {ai_response.bookName}")
+        else:
+            logger.error(f"Failed to create quiz for book: {ai_response.bookName}")
+        
+        return success
+    
     async def process_single_book(self, session: aiohttp.ClientSession, book_data: BookData) -> bool:
         """Process a single book."""
         try:
             logger.info(f"Processing book: Book {book_data.book_number} - {book_data.title}")
             
-            # Get book information from API
-            book_info = await self.get_book_by_title(session, book_data.title)
-            if not book_info:
-                logger.warning(f"Could not find book info for: {book_data.title}")
+            suggestion_request = await self.prepare_request(session, book_data)
+            if suggestion_request is None:
                 return False
+            book_name = suggestion_request.bookName
             
-            book_id = book_info.get('nid')
-            book_name = book_info.get('title', book_data.title)
-            
-            logger.info(f"Found book: {book_name} (ID: {book_id})")
-            
-            # Create request for AI suggestion
-            suggestion_request = single_book_suggestion_request(
-                extracted_quiz=book_data.quiz_content,
-                bookId=book_id,
-                bookName=book_name
+            # Plan the request locally before spending any tokens
+            plan = self.ai_suggestion.plan(suggestion_request)
+            logger.info(
+                f"Plan for {book_name}: {plan.mode}, ~{plan.prompt_tokens} prompt tokens, "
+                f"~{plan.estimated_seconds:.0f}s, ~${plan.estimated_cost_usd:.4f}"
             )
+            if plan.mode == "rejected":
+                logger.error(f"Skipping book {book_name}: {plan.reason}")
+                return False
             
             # Get AI suggestion
             ai_response = await self.ai_suggestion.get_suggestion(suggestion_request)
-            
-            # Convert to dictionary for API
-            quiz_data = {
-                "bookId": ai_response.bookId,
-                "bookName": ai_response.bookName,
-                "questions": ai_response.questions
-            }
-            
-            # Create quiz via API
-            success = await self.create_quiz(session, quiz_data)
-            if success:
-                logger.info(f"Successfully processed book: {book_name}")
-            else:
-                logger.error(f"Failed to create quiz for book: {book_name}")
-            
-            return success
+            return await self.publish_quiz(session, ai_response)
             
         except Exception as e:
             logger.error(f"Error processing book {book_data.title}: {e}")
             return False
     
+    async def process_books_with_batch_api(self, books: List[BookData]) -> Dict[str, int]:
+        """Format all books through one OpenAI Batch API job, then create the quizzes."""
+        results = {"successful": 0, "failed": 0}
+        
+        connector = aiohttp.TCPConnector(limit=10, limit_per_host=5)
+        timeout = aiohttp.ClientTimeout(total=300)
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            requests = {}
+            for book in books:
+                try:
+                    suggestion_request = await self.prepare_request(session, book)
+                except Exception as e:
+                    logger.error(f"Error preparing book {book.title}: {e}")
+                    suggestion_request = None
+                if suggestion_request is None:
+                    results["failed"] += 1
+                else:
+                    requests[book.book_number] = suggestion_request
+            
+            logger.info(f"Submitting {len(requests)} quizzes as one batch (this can take hours)")
+            ai_responses = await self.ai_suggestion.get_suggestions_batch(requests)
+            
+            for book_number, ai_response in ai_responses.items():
+                if isinstance(ai_response, Exception):
+                    logger.error(f"Batch formatting failed for book {book_number}: {ai_response}")
+                    results["failed"] += 1
+                elif await self.publish_quiz(session, ai_response):
+                    results["successful"] += 1
+                else:
+                    results["failed"] += 1
+        
+        return results
+    
     async def process_books_in_batches(self, books: List[BookData], batch_size: int = 3) -> Dict[str, int]:
-        """Process books in batches to avoid rate limiting."""
+        """Process books in batches; OpenAI calls are paced by the shared rate limiter."""
         results = {"successful": 0, "failed": 0}
         
         # Create aiohttp session
@@ -238,15 +296,10 @@ class MultipleBookProcessor:
                         results["successful"] += 1
                     else:
                         results["failed"] += 1
-                
-                # Add delay between batches to avoid rate limiting
-                if i + batch_size < len(books):
-                    logger.info("Waiting 2 seconds between batches...")
-                    await asyncio.sleep(2)
         
         return results
     
-    async def process_all_books(self):
+    async def process_all_books(self, batch: bool = False):
         """Process all books from the Multiple books.docx file."""
         try:
             if not self.multiple_books_file.exists():
@@ -267,8 +320,11 @@ class MultipleBookProcessor:
                 logger.warning("No books found in the document")
                 return
             
-            # Process books in batches
-            results = await self.process_books_in_batches(books, batch_size=3)
+            # Process books in batches, or all at once through the Batch API
+            if batch:
+                results = await self.process_books_with_batch_api(books)
+            else:
+                results = await self.process_books_in_batches(books, batch_size=3)
             
             # Save results to file
             self.save_results_to_file(books, results)
@@ -317,13 +373,24 @@ class MultipleBookProcessor:
         except Exception as e:
             logger.error(f"Error saving results to file: {e}")
 
-async def main():
+async def main(batch: bool = False):
     """Main function to run the multiple book processor."""
     try:
         processor = MultipleBookProcessor()
-        await processor.process_all_books()
+        await processor.ai_suggestion.warm_up()
+        try:
+            await processor.process_all_books(batch=batch)
+        finally:
+            await processor.ai_suggestion.aclose()
     except Exception as e:
         logger.error(f"Error in main: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Format and upload the quizzes in Multiple books.docx")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Format all quizzes through one OpenAI Batch API job (cheaper, completes within 24h)",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(batch=args.batch))
\ No newline at end of file
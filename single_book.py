@@ -1,13 +1,15 @@
 import os
+import argparse
 import asyncio
 import aiohttp
 import time
 from pathlib import Path
 from urllib.parse import quote
 from dotenv import load_dotenv
-from docx import Document
 
+from app.services.single_book_suggestion.extraction_cache import create_extraction_cache, extract_cached
 from app.services.single_book_suggestion.single_book_suggestion import AISuggestion
+from app.services.single_book_suggestion.text_extraction import extract_docx_text
 from app.services.single_book_suggestion.single_book_suggestion_schema import (
     single_book_suggestion_request,
     single_book_suggestion_response
@@ -23,12 +25,11 @@ class BookProcessor:
             raise ValueError("AUTH_TOKEN not found in environment variables")
         
         self.ai_suggestion = AISuggestion()
+        # Same cache directory as the API, so files already uploaded there are not parsed again.
+        self.extraction_cache = create_extraction_cache()
         self.base_url = "https://ashlynprasad-backend.vercel.app/api/v1"
         self.books_folder = Path("Book")
         
-        # Rate limiting - delay between API calls to avoid rate limiting
-        self.api_delay = 1.0  # 1 second between API calls
-        
     def extract_title_from_filename(self, filename: str) -> str:
         """Extract the book title from the filename (everything before ' by ')"""
         # Remove the .docx extension
@@ -45,12 +46,7 @@ class BookProcessor:
     def extract_text_from_docx(self, file_path: Path) -> str:
         """Extract text content from a DOCX file"""
         try:
-            document = Document(file_path)
-            paragraphs = [para.text.strip() for para in document.paragraphs if para.text.strip()]
-            text = "\n".join(paragraphs)
-            if not text.strip():
-                raise ValueError(f"DOCX file {file_path} contains no extractable text.")
-            return text
+            return extract_cached(self.extraction_cache, "docx", file_path, extract_docx_text)
         except Exception as e:
             raise ValueError(f"Unable to extract text from DOCX {file_path}: {e}")
     
@@ -101,67 +97,85 @@ class BookProcessor:
         except aiohttp.ClientError as e:
             raise ValueError(f"Network error when creating quiz: {e}")
     
+    async def prepare_request(self, session: aiohttp.ClientSession, file_path: Path) -> single_book_suggestion_request:
+        """Look up the book and extract the quiz text of a book file"""
+        # Extract title from filename
+        title = self.extract_title_from_filename(file_path.name)
+        print(f"Extracted title: {title}")
+        
+        # Get book info by title
+        book_info = await self.get_book_by_title(session, title)
+        book_id = book_info["nid"]
+        book_name = book_info["title"]
+        print(f"Found book ID: {book_id}, Name: {book_name}")
+        
+        # Extract text content from the docx file
+        extracted_quiz = self.extract_text_from_docx(file_path)
+        print(f"Extracted {len(extracted_quiz)} characters of quiz content")
+        
+        # Create request for AI suggestion
+        return single_book_suggestion_request(
+            extracted_quiz=extracted_quiz,
+            bookId=book_id,
+            bookName=book_name
+        )
+    
+    async def publish_quiz(
+        self, session: aiohttp.ClientSession, file_path: Path, ai_response: single_book_suggestion_response
+    ) -> dict:
+        """Create the formatted quiz via the API and return the result entry"""
+        # Convert to dict for API call
+        quiz_data = {
+            "bookId": ai_response.bookId,
+            "bookName": ai_response.bookName,
+            "questions": [question.model_dump() for question in ai_response.questions]
+        }
+        
+        # Create quiz via API
+        print("Creating quiz via API...")
+        quiz_result = await self.create_quiz(session, quiz_data)
+        
+        print(f"✅ Successfully processed: {file_path.name}")
+        return {
+            "file": file_path.name,
+            "book_id": ai_response.bookId,
+            "book_name": ai_response.bookName,
+            "status": "success",
+            "quiz_result": quiz_result
+        }
+    
+    def error_result(self, file_path: Path, error: Exception) -> dict:
+        print(f"❌ Error processing {file_path.name}: {str(error)}")
+        return {
+            "file": file_path.name,
+            "status": "error",
+            "error": str(error)
+        }
+    
     async def process_single_book(self, session: aiohttp.ClientSession, file_path: Path) -> dict:
         """Process a single book file"""
         try:
             print(f"Processing: {file_path.name}")
+            request_data = await self.prepare_request(session, file_path)
             
-            # Extract title from filename
-            title = self.extract_title_from_filename(file_path.name)
-            print(f"Extracted title: {title}")
-            
-            # Get book info by title
-            book_info = await self.get_book_by_title(session, title)
-            book_id = book_info["nid"]
-            book_name = book_info["title"]
-            print(f"Found book ID: {book_id}, Name: {book_name}")
-            
-            # Extract text content from the docx file
-            extracted_quiz = self.extract_text_from_docx(file_path)
-            print(f"Extracted {len(extracted_quiz)} characters of quiz content")
-            
-            # Create request for AI suggestion
-            request_data = single_book_suggestion_request(
-                extracted_quiz=extracted_quiz,
-                bookId=book_id,
-                bookName=book_name
+            # Plan the request locally before spending any tokens
+            plan = self.ai_suggestion.plan(request_data)
+            print(
+                f"Plan: {plan.mode}, ~{plan.prompt_tokens} prompt tokens, "
+                f"~{plan.estimated_seconds:.0f}s, ~${plan.estimated_cost_usd:.4f}"
             )
+            if plan.mode == "rejected":
+                raise ValueError(plan.reason)
             
             # Get AI suggestion (formatted quiz)
             print("Getting AI suggestion...")
             ai_response = await self.ai_suggestion.get_suggestion(request_data)
-            
-            # Convert to dict for API call
-            quiz_data = {
-                "bookId": ai_response.bookId,
-                "bookName": ai_response.bookName,
-                "questions": ai_response.questions
-            }
-            
-            # Create quiz via API
-            print("Creating quiz via API...")
-            quiz_result = await self.create_quiz(session, quiz_data)
-            
-            print(f"✅ Successfully processed: {file_path.name}")
-            return {
-                "file": file_path.name,
-                "book_id": book_id,
-                "book_name": book_name,
-                "status": "success",
-                "quiz_result": quiz_result
-            }
+            return await self.publish_quiz(session, file_path, ai_response)
             
         except Exception as e:
-            error_msg = f"❌ Error processing {file_path.name}: {str(e)}"
-            print(error_msg)
-            return {
-                "file": file_path.name,
-                "status": "error",
-                "error": str(e)
-            }
+            return self.error_result(file_path, e)
     
-    async def process_all_books(self):
-        """Process all books in the Book folder"""
+    def get_book_files(self) -> list:
         if not self.books_folder.exists():
             raise ValueError(f"Book folder not found: {self.books_folder}")
         
@@ -171,27 +185,64 @@ class BookProcessor:
             raise ValueError("No .docx files found in the Book folder")
         
         print(f"Found {len(docx_files)} book files to process")
-        
+        return docx_files
+    
+    async def process_all_books(self):
+        """Process all books in the Book folder"""
+        docx_files = self.get_book_files()
         results = []
         
         # Create a single aiohttp session for all requests
         async with aiohttp.ClientSession() as session:
-            # Process books with some delay to avoid rate limiting
-            for i, file_path in enumerate(docx_files):
-                if i > 0:  # Add delay between books (except for the first one)
-                    print(f"Waiting {self.api_delay} seconds to avoid rate limiting...")
-                    await asyncio.sleep(self.api_delay)
-                
+            # OpenAI calls are paced by the shared rate limiter, so no fixed delay is needed
+            for file_path in docx_files:
                 result = await self.process_single_book(session, file_path)
                 results.append(result)
         
         return results
+    
+    async def process_all_books_batch(self):
+        """Process all books in the Book folder through one OpenAI Batch API job"""
+        docx_files = self.get_book_files()
+        results = []
+        
+        async with aiohttp.ClientSession() as session:
+            requests = {}
+            for file_path in docx_files:
+                try:
+                    print(f"Preparing: {file_path.name}")
+                    requests[file_path.name] = await self.prepare_request(session, file_path)
+                except Exception as e:
+                    results.append(self.error_result(file_path, e))
+            
+            print(f"Submitting {len(requests)} quizzes as one batch (this can take hours)...")
+            ai_responses = await self.ai_suggestion.get_suggestions_batch(requests)
+            
+            for file_path in docx_files:
+                ai_response = ai_responses.get(file_path.name)
+                if ai_response is None:
+                    continue
+                try:
+                    if isinstance(ai_response, Exception):
+                        raise ai_response
+                    results.append(await self.publish_quiz(session, file_path, ai_response))
+                except Exception as e:
+                    results.append(self.error_result(file_path, e))
+        
+        return results
 
-async def main():
+async def main(batch: bool = False):
     """Main function to run the book processing"""
     try:
         processor = BookProcessor()
-        results = await processor.process_all_books()
+        await processor.ai_suggestion.warm_up()
+        try:
+            if batch:
+                results = await processor.process_all_books_batch()
+            else:
+                results = await processor.process_all_books()
+        finally:
+            await processor.ai_suggestion.aclose()
         
         # Print summary
         print("\n" + "="*50)
@@ -222,5 +273,12 @@ async def main():
     return 0
 
 if __name__ == "__main__":
-    exit_code = asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Format and upload the quizzes in the Book folder")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Format all quizzes through one OpenAI Batch API job (cheaper, completes within 24h)",
+    )
+    args = parser.parse_args()
+    exit_code = asyncio.run(main(batch=args.batch))
     exit(exit_code)
\ No newline at end of file
@@ -0,0 +1,40 @@
+import pytest
+
+from app.services.single_book_suggestion.json_repair import QuizJSONError, repair_quiz_json
+
+QUESTION_1 = '{"questionNo": 1, "content": "2 + 2?", "options": ["3", "4"], "correctAnswers": ["4"]}'
+QUESTION_2 = '{"questionNo": 2, "content": "Prime?", "options": ["2", "4"], "correctAnswers": ["2"]}'
+
+
+def test_well_formed_document():
+    repaired = repair_quiz_json(f'{{"questions": [{QUESTION_1}, {QUESTION_2}]}}')
+    assert repaired.complete
+    assert not repaired.repaired
+    assert [q.questionNo for q in repaired.questions] == [1, 2]
+
+
+def test_fenced_json_with_trailing_prose():
+    text = f'```json\n{{"questions": [{QUESTION_1}]}}\n```\nLet me know if you need anything else.'
+    repaired = repair_quiz_json(text)
+    assert repaired.complete
+    assert repaired.repaired
+    assert repaired.questions[0].correctAnswers == ["4"]
+
+
+def test_truncated_array_keeps_complete_questions():
+    text = f'{{"questions": [{QUESTION_1}, {QUESTION_2}, {{"questionNo": 3, "content": "Cut o'
+    repaired = repair_quiz_json(text)
+    assert not repaired.complete
+    assert repaired.repaired
+    assert [q.questionNo for q in repaired.questions] == [1, 2]
+    assert repaired.partial_text.endswith(QUESTION_2)
+
+
+def test_truncated_before_any_question():
+    with pytest.raises(QuizJSONError):
+        repair_quiz_json('{"questions": [{"questionNo": 1, "cont')
+
+
+def test_schema_mismatch_is_reported():
+    with pytest.raises(QuizJSONError, match="questionNo"):
+        repair_quiz_json('{"questions": [{"questionNo": "one", "content": "x", "options": [], "correctAnswers": []}]}')
@@ -0,0 +1,107 @@
+import pytest
+
+from app.services.single_book_suggestion.local_quiz_parser import _Question, parse_quiz
+
+
+def question(options, answer=None, marked=()):
+    parsed = _Question(1, "Which animal barks?")
+    parsed.labels = [chr(ord("a") + index) for index in range(len(options))]
+    parsed.options = list(options)
+    parsed.marked = list(marked)
+    parsed.answer = answer
+    return parsed
+
+
+def test_numbered_dialect():
+    result = parse_quiz(
+        "Chapter 3 quiz\n"
+        "1. What colour is the sky?\n"
+        "a) Blue\n"
+        "b) Green\n"
+        "Answer: a\n"
+        "2. Which are even?\n"
+        "a) 2\n"
+        "b) 3\n"
+        "c) 4\n"
+        "Answer: a, c\n"
+    )
+    assert result.dialect == "numbered"
+    assert result.confidence == 1.0
+    assert result.questions == [
+        {"questionNo": 1, "content": "What colour is the sky?", "options": ["Blue", "Green"], "correctAnswers": ["Blue"]},
+        {"questionNo": 2, "content": "Which are even?", "options": ["2", "3", "4"], "correctAnswers": ["2", "4"]},
+    ]
+
+
+def test_q_prefixed_dialect_with_marked_answers():
+    result = parse_quiz(
+        "Q1: Capital of France?\n"
+        "A. Berlin\n"
+        "*B. Paris\n"
+        "Question 2 - Largest planet?\n"
+        "A. Jupiter (correct)\n"
+        "B. Mars\n"
+    )
+    assert result.dialect == "q_prefixed"
+    assert result.confidence == 1.0
+    assert [q["correctAnswers"] for q in result.questions] == [["Paris"], ["Jupiter"]]
+    assert result.questions[1]["options"] == ["Jupiter", "Mars"]
+
+
+def test_paren_options_dialect_with_wrapped_stem():
+    result = parse_quiz(
+        "1) Who wrote the letter\n"
+        "that started the story?\n"
+        "(a) Anna\n"
+        "(b) Ben\n"
+        "Ans: (b)\n"
+    )
+    assert result.dialect == "numbered_paren_options"
+    assert result.questions[0]["content"] == "Who wrote the letter that started the story?"
+    assert result.questions[0]["correctAnswers"] == ["Ben"]
+
+
+def test_unstructured_text_has_no_confidence():
+    result = parse_quiz("Read chapter three and write a short summary of the plot.")
+    assert result.confidence == 0.0
+    assert result.questions == []
+
+
+def test_missing_answer_lowers_confidence():
+    result = parse_quiz("1. First?\na) x\nb) y\nAnswer: a\n2. Second?\na) x\nb) y\n")
+    assert result.confidence == 0.5
+    assert result.questions[1]["correctAnswers"] == []
+
+
+@pytest.mark.parametrize(
+    "answer, expected",
+    [
+        ("b", ["A dog"]),
+        ("(b)", ["A dog"]),
+        ("B.", ["A dog"]),
+        ("b) A dog", ["A dog"]),
+        ("a. A cat", ["A cat"]),
+        ("A cat", ["A cat"]),
+        ("a and b", ["A cat", "A dog"]),
+    ],
+)
+def test_answer_resolution(answer, expected):
+    assert question(["A cat", "A dog"], answer).resolve_answers() == expected
+
+
+@pytest.mark.parametrize(
+    "answer",
+    [
+        "b) A cat",  # label and text disagree
+        "e",  # no such option
+        "bd",  # not a label
+        "A bird",  # neither a label nor an option text
+        "a, e",  # one unresolvable part rejects the whole answer
+    ],
+)
+def test_answer_resolution_rejects(answer):
+    assert question(["A cat", "A dog"], answer).resolve_answers() == []
+
+
+def test_marked_options_win_over_answer_line():
+    assert question(["A cat", "A dog"], "a", marked=["A dog"]).resolve_answers() == ["A dog"]
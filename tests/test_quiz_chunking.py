@@ -0,0 +1,39 @@
+from app.services.single_book_suggestion.quiz_chunking import merge_questions
+from app.services.single_book_suggestion.single_book_suggestion_schema import quiz_question
+
+
+def question(number, content, options=("Yes", "No")):
+    return quiz_question(questionNo=number, content=content, options=list(options), correctAnswers=[options[0]])
+
+
+def contents(questions):
+    return [q.content for q in questions]
+
+
+def test_merge_renumbers_from_one():
+    merged = merge_questions([[question(1, "A?"), question(2, "B?")], [question(1, "C?")]])
+    assert contents(merged) == ["A?", "B?", "C?"]
+    assert [q.questionNo for q in merged] == [1, 2, 3]
+
+
+def test_repeats_across_a_chunk_boundary_are_dropped():
+    first = [question(1, "A?"), question(2, "B?"), question(3, "C?")]
+    # The model restated the last two questions of the previous chunk, with its own numbering.
+    second = [question(1, "2. B?"), question(2, "c?"), question(3, "D?")]
+    assert contents(merge_questions([first, second])) == ["A?", "B?", "C?", "D?"]
+
+
+def test_repeats_away_from_the_boundary_are_kept():
+    first = [question(1, "A?"), question(2, "B?"), question(3, "C?")]
+    second = [question(1, "D?"), question(2, "A?")]
+    assert contents(merge_questions([first, second])) == ["A?", "B?", "C?", "D?", "A?"]
+
+
+def test_same_stem_with_different_options_is_kept():
+    first = [question(1, "Choose the correct answer.", ("Red", "Blue"))]
+    second = [question(1, "Choose the correct answer.", ("Cat", "Dog"))]
+    assert len(merge_questions([first, second])) == 2
+
+
+def test_empty_chunks():
+    assert contents(merge_questions([[], [question(1, "A?")], []])) == ["A?"]